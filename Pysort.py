@@ -1,50 +1,23 @@
-import os
-import shutil
-import tkinter as tk
-from tkinter import filedialog, messagebox
-from pathlib import Path
+import queue
+import threading
 import time
-import uuid
-
-# Constants
-LOG_FILE = "sorting_log.txt"
-MAX_UNDO_STEPS = 100
-
-# Define file categories
-FILE_CATEGORIES = {
-    "Documents": [".pdf", ".docx", ".txt", ".xlsx", ".pptx", ".doc", ".rtf", ".csv", ".odt"],
-    "Images": [".jpg", ".png", ".jpeg", ".gif", ".bmp", ".tiff", ".svg", ".webp", ".heic"],
-    "Videos": [".mp4", ".avi", ".mkv", ".mov", ".wmv", ".flv", ".webm", ".m4v", ".mpg"],
-    "Music": [".mp3", ".wav", ".aac", ".flac", ".ogg", ".wma", ".m4a", ".opus"],
-    "Archives": [".zip", ".rar", ".tar", ".7z", ".gz", ".bz2", ".xz", ".iso"],
-    "Executables": [".exe", ".msi", ".bat", ".sh", ".app", ".dmg", ".pkg"],
-    "Code": [
-        # Source code files
-        ".py", ".java", ".c", ".cpp", ".h", ".hpp", ".cs", ".js", ".ts", 
-       ".php", ".rb", ".go", ".swift", ".kt", ".scala", ".m", ".pl",
-        # Web files
-        ".html", ".htm", ".css", ".scss", ".sass", ".less", ".jsx", ".tsx",
-        # Configuration files
-        ".json", ".yml", ".yaml", ".xml", ".toml", ".ini", ".cfg", ".conf",
-        # Script files
-        ".sh", ".bash", ".zsh", ".ps1", ".bat", ".cmd",
-        # Build/development files
-        ".md", ".markdown", ".rst", ".dockerfile", ".gitignore", ".gitattributes",
-        # Data files
-        ".sql", ".db", ".sqlite", ".dump",
-       #  Other development files
-       ".ipynb", ".env", ".lock"
-    ],
-    "Others": []
-}
-
-# Windows special folders
-WINDOWS_FOLDERS = {
-    "Documents": Path(os.path.expandvars("%USERPROFILE%")) / "Documents",
-    "Pictures": Path(os.path.expandvars("%USERPROFILE%")) / "Pictures",
-    "Videos": Path(os.path.expandvars("%USERPROFILE%")) / "Videos",
-    "Music": Path(os.path.expandvars("%USERPROFILE%")) / "Music",
-}
+import tkinter as tk
+from tkinter import filedialog, messagebox, ttk
+
+from filesorter import (
+    DEFAULT_WORKERS,
+    FILE_CATEGORIES,
+    SessionStore,
+    WalkOptions,
+    execute_plan,
+    finish_session,
+    plan_custom_sort,
+    plan_subdirectory_sort,
+    plan_windows_sort,
+    recover_session,
+    rollback_operations,
+    undo_operations,
+)
 
 class FileSorterApp:
     def __init__(self):
@@ -52,78 +25,62 @@ class FileSorterApp:
         self.icon = tk.PhotoImage(file="icon.png")
         self.root.iconphoto(True, self.icon)
         self.root.withdraw()
-        self.current_session_id = None
-        
-        # Initialize log file
-        if not os.path.exists(LOG_FILE):
-            open(LOG_FILE, 'w').close()
+        self.journal = SessionStore()
+        self.progress_queue = queue.Queue()
+        self.deferred_sessions = set()
         
         self.open_main_window()
+        self.root.after(0, self.recover_interrupted_sessions)
+
+    def recover_interrupted_sessions(self):
+        """Offer to finish or roll back sorts that were cut short, one at a time
+
+        The chosen recovery runs through run_sort; when it is done the
+        next interrupted session is offered.
+        """
+        for session in self.journal.interrupted_sessions():
+            session_id = session["id"]
+            if session_id in self.deferred_sessions:
+                continue
+            answer = messagebox.askyesnocancel("Interrupted Sort",
+                                               f"A sort started {session['started']} did not finish "
+                                               f"({session['pending']} files outstanding).\n"
+                                               "Yes: finish it\nNo: undo it\nCancel: decide later")
+            if answer is None:
+                self.deferred_sessions.add(session_id)
+                continue
+            if answer:
+                self.run_sort(self.recovered_moves(session_id), self.resume_done,
+                              lambda moves, progress, cancel: finish_session(
+                                  self.journal, session_id, moves, progress=progress, cancel=cancel))
+            else:
+                self.run_sort(self.rollback_plan(session_id), self.rollback_done, self.execute_undo,
+                              title="Undoing...")
+            return
 
-    def start_new_session(self):
-        """Generate a new unique session ID for each sorting operation"""
-        self.current_session_id = str(uuid.uuid4())
-
-    def log_operation(self, source, destination):
-        """Log a file move operation with session ID"""
-        timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-        with open(LOG_FILE, "a") as f:
-            f.write(f"{timestamp}|{self.current_session_id}|{source}|{destination}\n")
-        self.clear_old_log_entries()
-
-    def clear_old_log_entries(self):
-        """Keep only the most recent operations"""
-        if os.path.exists(LOG_FILE):
-            with open(LOG_FILE, "r") as f:
-                lines = f.readlines()
-            if len(lines) > MAX_UNDO_STEPS:
-                with open(LOG_FILE, "w") as f:
-                    f.writelines(lines[-MAX_UNDO_STEPS:])
-
-    def get_last_session_operations(self):
-        """Get all operations from the most recent session"""
-        if not os.path.exists(LOG_FILE):
-            return []
-        
-        with open(LOG_FILE, "r") as f:
-            lines = f.readlines()
-        
-        if not lines:
-            return []
-        
-        # Find the most recent session ID
-        last_session_id = None
-        for line in reversed(lines):
-            parts = line.strip().split("|")
-            if len(parts) >= 3:
-                last_session_id = parts[1]
-                break
-        
-        if not last_session_id:
-            return []
-        
-        # Get all operations from that session
-        operations = []
-        for line in reversed(lines):
-            parts = line.strip().split("|")
-            if len(parts) >= 4 and parts[1] == last_session_id:
-                operations.append({
-                    "timestamp": parts[0],
-                    "session": parts[1],
-                    "source": parts[2],
-                    "destination": parts[3]
-                })
-        
-        return operations
+    def recovered_moves(self, session_id):
+        """Moves a session still has to make, reconciled once the worker starts iterating"""
+        yield from recover_session(self.journal, session_id)
+
+    def rollback_plan(self, session_id):
+        yield from rollback_operations(self.journal, session_id)
+
+    def resume_done(self, result):
+        messagebox.showinfo("Sort Resumed", self.sort_summary(result) +
+                            f"Total files moved: {result.moved}")
+        self.recover_interrupted_sessions()
+
+    def rollback_done(self, result):
+        self.undo_done(result)
+        self.recover_interrupted_sessions()
 
     def undo_last_session(self):
         """Undo only the most recent sorting session"""
-        operations = self.get_last_session_operations()
+        operations = self.journal.get_last_session_operations()
         if not operations:
             messagebox.showinfo("Info", "No operations to undo!")
             return
         
-        session_id = operations[0]["session"]
         session_time = operations[0]["timestamp"]
         
         if not messagebox.askyesno("Confirm Undo", 
@@ -131,46 +88,127 @@ class FileSorterApp:
                                  f"({len(operations)} files will be moved back)"):
             return
         
-        success_count = 0
-        error_count = 0
-        
-        for op in reversed(operations):  # Undo in reverse order of original moves
-            try:
-                # Create parent directory if it doesn't exist
-                os.makedirs(os.path.dirname(op["source"]), exist_ok=True)
-                
-                # Move file back if it exists at destination
-                if os.path.exists(op["destination"]):
-                    shutil.move(op["destination"], op["source"])
-                    success_count += 1
-                
-                # Try to remove empty directory
-                dest_dir = os.path.dirname(op["destination"])
-                if os.path.exists(dest_dir) and not os.listdir(dest_dir):
-                    try:
-                        os.rmdir(dest_dir)
-                    except OSError:
-                        pass  # Directory not empty or other error
-                    
-            except Exception as e:
-                print(f"Error undoing {op['destination']}: {e}")
-                error_count += 1
-        
-        # Remove undone operations from log
-        if success_count > 0:
-            with open(LOG_FILE, "r") as f:
-                lines = f.readlines()
-            
-            # Keep only lines that aren't from this session
-            with open(LOG_FILE, "w") as f:
-                for line in lines:
-                    parts = line.strip().split("|")
-                    if len(parts) < 3 or parts[1] != session_id:
-                        f.write(line)
-        
+        self.run_sort(iter(operations), self.undo_done, self.execute_undo, title="Undoing...")
+
+    def execute_undo(self, operations, progress, cancel):
+        return undo_operations(list(operations), self.journal, DEFAULT_WORKERS, progress=progress, cancel=cancel)
+
+    def undo_done(self, result):
         messagebox.showinfo("Undo Complete", 
-                          f"Successfully undone {success_count} files\n"
-                          f"Errors: {error_count}")
+                          f"Successfully undone {result.restored} files\n"
+                          f"Errors: {result.errors}")
+
+    def run_sort(self, plan, on_done, execute=None, title="Sorting..."):
+        """Run a sort plan on a worker thread while showing a progress window
+
+        execute(moves, progress, cancel) replaces execute_plan, for work
+        such as recovery that reports progress the same way.
+        """
+        self.cancel_event = threading.Event()
+        self.progress_window = tk.Toplevel()
+        self.progress_window.title(title)
+        self.progress_window.geometry("400x170")
+        self.progress_window.resizable(False, False)
+        self.progress_window.configure(bg="#1E1E1E")
+        self.progress_window.protocol("WM_DELETE_WINDOW", self.cancel_event.set)
+        self.progress_window.grab_set()
+
+        self.progress_label = tk.Label(self.progress_window, text="Scanning files...", fg="#FFFFFF", bg="#1E1E1E")
+        self.progress_label.pack(pady=10)
+        # Indeterminate until the plan is exhausted and the total is known
+        self.progress_bar = ttk.Progressbar(self.progress_window, length=350, mode="indeterminate")
+        self.progress_bar.pack(pady=5)
+        self.progress_bar.start(10)
+        self.progress_total = None
+        self.progress_done = 0
+        self.progress_started = time.monotonic()
+        self.progress_rate = tk.Label(self.progress_window, text="", fg="#CCCCCC", bg="#1E1E1E")
+        self.progress_rate.pack()
+        tk.Button(self.progress_window, text="Cancel", bg="#F44336", fg="white", width=10,
+                  command=self.cancel_event.set).pack(pady=10)
+
+        worker = threading.Thread(target=self.sort_worker, args=(plan, execute or self.execute_sort), daemon=True)
+        worker.start()
+        self.root.after(100, self.poll_progress, on_done)
+
+    def execute_sort(self, moves, progress, cancel):
+        return execute_plan(moves, self.journal, progress=progress, cancel=cancel)
+
+    def sort_worker(self, plan, execute):
+        """Plan and execute a sort off the Tk thread, reporting through progress_queue
+
+        Moves run as the plan produces them, so a big folder starts moving
+        before its scan is done; the total is reported once the plan ends.
+        """
+        try:
+            planned = 0
+            last_report = 0
+
+            def streamed():
+                nonlocal planned
+                for move in plan:
+                    if self.cancel_event.is_set():
+                        break
+                    planned += 1
+                    yield move
+                self.progress_queue.put(("total", planned))
+
+            def progress(done, errors):
+                nonlocal last_report
+                now = time.monotonic()
+                if now - last_report >= 0.1:
+                    last_report = now
+                    self.progress_queue.put(("progress", (done, planned)))
+
+            result = execute(streamed(), progress, self.cancel_event)
+            self.progress_queue.put(("done", result))
+        except Exception as e:
+            self.progress_queue.put(("error", e))
+
+    def poll_progress(self, on_done):
+        """Drain worker messages and refresh the progress window"""
+        try:
+            while True:
+                kind, value = self.progress_queue.get_nowait()
+                if kind == "total":
+                    self.progress_total = value
+                    self.progress_bar.stop()
+                    self.progress_bar.configure(mode="determinate", maximum=max(value, 1))
+                    self.show_progress(self.progress_done, value)
+                elif kind == "progress":
+                    self.show_progress(*value)
+                else:
+                    self.progress_window.grab_release()
+                    self.progress_window.destroy()
+                    if kind == "error":
+                        messagebox.showerror("Error", f"Sorting failed: {value}")
+                    else:
+                        on_done(value)
+                    return
+        except queue.Empty:
+            pass
+        if self.cancel_event.is_set():
+            self.progress_label.configure(text="Cancelling...")
+        self.root.after(100, self.poll_progress, on_done)
+
+    def show_progress(self, done, planned):
+        self.progress_done = done
+        total = self.progress_total
+        elapsed = time.monotonic() - self.progress_started
+        rate = done / elapsed if elapsed > 0 else 0
+        if total is None:
+            self.progress_label.configure(text=f"{done} files, {planned} found so far...")
+            self.progress_rate.configure(text=f"{rate:.0f} files/s")
+            return
+        eta = (total - done) / rate if rate > 0 else 0
+        self.progress_bar.configure(value=done)
+        self.progress_label.configure(text=f"{done} / {total} files")
+        self.progress_rate.configure(text=f"{rate:.0f} files/s, ETA {int(eta) // 60}:{int(eta) % 60:02d}")
+
+    def sort_summary(self, result):
+        if result.cancelled:
+            return "Sorting cancelled.\n"
+        return "Files sorted successfully!\n"
 
     def create_back_button(self, window):
         back_btn = tk.Button(
@@ -270,7 +308,6 @@ class FileSorterApp:
                  command=self.perform_custom_sort).pack(pady=20)
 
     def perform_custom_sort(self):
-        self.start_new_session()
         source_folder = self.source_entry.get()
         if not source_folder:
             messagebox.showerror("Error", "Please select a source folder!")
@@ -278,9 +315,9 @@ class FileSorterApp:
 
         dest_folder = self.dest_entry.get() if self.dest_entry.get() else source_folder
 
-        selected_categories = {category: FILE_CATEGORIES[category] 
-                             for category, var in self.file_type_vars.items() 
-                             if var.get()}
+        selected_categories = [category
+                               for category, var in self.file_type_vars.items()
+                               if var.get()]
         
         if not selected_categories:
             messagebox.showerror("Error", "Please select at least one file type to sort!")
@@ -296,55 +333,12 @@ class FileSorterApp:
             messagebox.showerror("Error", "Please enter valid numbers for N files")
             return
 
-        start_time = time.time()
-        files = os.listdir(source_folder)
-        sorted_count = 0
-
-        if first_n:
-            files = files[:first_n]
-        elif last_n:
-            files = files[-last_n:]
-
-        for file in files:
-            file_path = os.path.join(source_folder, file)
-            if os.path.isfile(file_path):
-                file_ext = os.path.splitext(file)[1].lower()
-                file_moved = False
-
-                for category, extensions in selected_categories.items():
-                    if file_ext in extensions:
-                        dest_dir = os.path.join(dest_folder, category)
-                        os.makedirs(dest_dir, exist_ok=True)
-                        try:
-                            dest_path = os.path.join(dest_dir, file)
-                            shutil.move(file_path, dest_path)
-                            self.log_operation(file_path, dest_path)
-                            sorted_count += 1
-                            file_moved = True
-                            break
-                        except Exception as e:
-                            print(f"Error moving {file}: {e}")
-                            file_moved = True
-                            break
-
-                if not file_moved and "Others" in selected_categories:
-                    dest_dir = os.path.join(dest_folder, "Others")
-                    os.makedirs(dest_dir, exist_ok=True)
-                    try:
-                        dest_path = os.path.join(dest_dir, file)
-                        shutil.move(file_path, dest_path)
-                        self.log_operation(file_path, dest_path)
-                        sorted_count += 1
-                    except Exception as e:
-                        print(f"Error moving {file}: {e}")
-
-        end_time = time.time()
-        time_taken = end_time - start_time
-        
-        messagebox.showinfo("Success", 
-                          f"Files sorted successfully!\n"
-                          f"Total files moved: {sorted_count}\n"
-                          f"Time taken: {time_taken:.2f} seconds")
+        moves = plan_custom_sort(source_folder, dest_folder, selected_categories, first_n, last_n)
+        self.run_sort(moves, lambda result: messagebox.showinfo(
+            "Success",
+            self.sort_summary(result) +
+            f"Total files moved: {result.moved}\n"
+            f"Time taken: {result.time_taken:.2f} seconds"))
 
     def open_windows_sort_ui(self):
         self.main_root.destroy()
@@ -368,45 +362,18 @@ class FileSorterApp:
                   command=self.sort_files_to_windows_folders).pack(pady=20)
 
     def sort_files_to_windows_folders(self):
-        self.start_new_session()
         source_folder = self.folder_entry.get()
         if not source_folder:
             messagebox.showerror("Error", "Please select a source folder!")
             return
 
-        start_time = time.time()
-        files_moved = 0
-        
-        for file in os.listdir(source_folder):
-            file_path = os.path.join(source_folder, file)
-            if os.path.isfile(file_path):
-                file_ext = os.path.splitext(file)[1].lower()
-                
-                destination_folder = None
-                for category, extensions in FILE_CATEGORIES.items():
-                    if file_ext in extensions:
-                        if category == "Images":
-                            destination_folder = WINDOWS_FOLDERS.get("Pictures")
-                        elif category in WINDOWS_FOLDERS:
-                            destination_folder = WINDOWS_FOLDERS.get(category)
-                        break
-                
-                if destination_folder:
-                    try:
-                        os.makedirs(destination_folder, exist_ok=True)
-                        dest_path = destination_folder / file
-                        shutil.move(file_path, str(dest_path))
-                        self.log_operation(file_path, str(dest_path))
-                        files_moved += 1
-                    except Exception as e:
-                        print(f"Error moving {file}: {e}")
-
-        end_time = time.time()
-        time_taken = end_time - start_time
-        
+        self.run_sort(plan_windows_sort(source_folder), self.windows_sort_done)
+
+    def windows_sort_done(self, result):
         messagebox.showinfo("Sorting Complete", 
-                           f"Moved {files_moved} files to Windows directories.\n"
-                           f"Time taken: {time_taken:.2f} seconds")
+                           ("Sorting cancelled.\n" if result.cancelled else "") +
+                           f"Moved {result.moved} files to Windows directories.\n"
+                           f"Time taken: {result.time_taken:.2f} seconds")
         self.windows_sort_root.destroy()
         self.open_main_window()
 
@@ -426,59 +393,25 @@ class FileSorterApp:
         self.source_entry.pack(pady=5)
         tk.Button(self.sort_root, text="Browse", command=lambda: self.select_folder(self.source_entry), bg="#2196F3", fg="white").pack(pady=5)
 
+        self.recursive_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(self.sort_root, text="Include subfolders", variable=self.recursive_var,
+                       fg="#FFFFFF", bg="#1E1E1E", selectcolor="#1E1E1E").pack(pady=5)
+
         tk.Button(self.sort_root, text="Sort Files", font=("Arial", 14, "bold"), bg="#4CAF50", fg="white", padx=20, pady=10, width=20,
                  command=self.perform_subdirectory_sort).pack(pady=20)
 
     def perform_subdirectory_sort(self):
-        self.start_new_session()
         source_folder = self.source_entry.get()
         if not source_folder:
             messagebox.showerror("Error", "Please select a source folder!")
             return
 
-        start_time = time.time()
-        sorted_count = 0
-
-        for file in os.listdir(source_folder):
-            file_path = os.path.join(source_folder, file)
-            if os.path.isfile(file_path):
-                file_ext = os.path.splitext(file)[1].lower()
-                file_moved = False
-
-                for category, extensions in FILE_CATEGORIES.items():
-                    if file_ext in extensions:
-                        dest_folder = os.path.join(source_folder, category)
-                        os.makedirs(dest_folder, exist_ok=True)
-                        try:
-                            dest_path = os.path.join(dest_folder, file)
-                            shutil.move(file_path, dest_path)
-                            self.log_operation(file_path, dest_path)
-                            sorted_count += 1
-                            file_moved = True
-                            break
-                        except Exception as e:
-                            print(f"Error moving {file}: {e}")
-                            file_moved = True
-                            break
-
-                if not file_moved:
-                    dest_folder = os.path.join(source_folder, "Others")
-                    os.makedirs(dest_folder, exist_ok=True)
-                    try:
-                        dest_path = os.path.join(dest_folder, file)
-                        shutil.move(file_path, dest_path)
-                        self.log_operation(file_path, dest_path)
-                        sorted_count += 1
-                    except Exception as e:
-                        print(f"Error moving {file}: {e}")
-
-        end_time = time.time()
-        time_taken = end_time - start_time
-        
-        messagebox.showinfo("Success", 
-                           f"Files sorted successfully!\n"
-                           f"Total files moved: {sorted_count}\n"
-                           f"Time taken: {time_taken:.2f} seconds")
+        walk = WalkOptions() if self.recursive_var.get() else None
+        self.run_sort(plan_subdirectory_sort(source_folder, walk=walk), lambda result: messagebox.showinfo(
+            "Success",
+            self.sort_summary(result) +
+            f"Total files moved: {result.moved}\n"
+            f"Time taken: {result.time_taken:.2f} seconds"))
 
 # Start the application
 if __name__ == "__main__":
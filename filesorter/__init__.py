@@ -0,0 +1,37 @@
+"""Headless sorting engine shared by the Pysort GUI and the pysort command line"""
+
+from .categories import (
+    FILE_CATEGORIES,
+    WINDOWS_FOLDERS,
+    ExtensionIndex,
+    rebuild_extension_index,
+)
+from .classify import classify, classify_path, classify_record
+from .dedup import HashCache, dedupe, find_duplicates
+from .engine import (
+    Move,
+    SortResult,
+    UndoResult,
+    execute_plan,
+    plan_custom_sort,
+    plan_subdirectory_sort,
+    plan_windows_sort,
+    undo_operations,
+)
+from .executor import DEFAULT_WORKERS
+from .jobs import Job, JobError, JobResult, job_operations, load_jobs, run_jobs
+from .journal import LOG_FILE, Journal
+from .metrics import Metrics
+from .planner import PlanSummary, dry_run, read_plan, write_plan
+from .recovery import (
+    finish_session,
+    recover_session,
+    resume_session,
+    rollback_operations,
+    rollback_session,
+)
+from .rules import RuleError, RuleSet
+from .scanner import FileRecord, WalkOptions, scan_files, walk_files
+from .sniff import Sniffer
+from .store import DB_FILE, SessionStore
+from .watch import Watcher
@@ -0,0 +1,258 @@
+"""Benchmark the sorting pipeline on a generated corpus: python -m filesorter bench"""
+
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from .categories import FILE_CATEGORIES
+from .classify import classify, classify_record
+from .engine import plan_subdirectory_sort, scan, undo_operations
+from .executor import MoveExecutor
+from .journal import Journal
+from .scanner import WalkOptions
+from .sniff import SIGNATURES
+from .store import SessionStore
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Constants
+UNKNOWN_EXTENSIONS = ("", ".dat", ".bin")
+DEFAULT_CORPUS = {
+    "files": 10_000,
+    "seed": 0,
+    "size_median": 16 << 10,   # bytes; sizes are log-normal around this
+    "size_sigma": 1.5,
+    "size_max": 64 << 20,
+    "unknown_rate": 0.05,      # files whose extension says nothing, half with a sniffable header
+    "depth": 0,                # folder levels below the root
+    "fanout": 4,               # subfolders per folder
+    "collision_rate": 0.1,     # files reusing a name from another folder
+    "extensions": None,        # {".ext": weight}; defaults to every known extension equally
+}
+
+
+def corpus_spec(**overrides):
+    """DEFAULT_CORPUS with the given settings replaced"""
+    unknown = set(overrides) - set(DEFAULT_CORPUS)
+    if unknown:
+        raise ValueError(f"Unknown corpus settings: {', '.join(sorted(unknown))}")
+    spec = dict(DEFAULT_CORPUS)
+    spec.update((key, value) for key, value in overrides.items() if value is not None)
+    return spec
+
+
+def corpus_folders(root, depth, fanout):
+    folders = [root]
+    level = [root]
+    for _ in range(depth):
+        level = [os.path.join(parent, f"d{i}") for parent in level for i in range(fanout)]
+        folders.extend(level)
+    return folders
+
+
+def generate_corpus(root, spec):
+    """Write a synthetic tree under root and return its total size in bytes
+
+    Files are sparse (truncated to size) so large corpora are cheap to
+    create; the content is only written where a header is needed for
+    sniffing.
+    """
+    rng = random.Random(spec["seed"])
+    extensions = spec["extensions"] or {ext: 1 for exts in FILE_CATEGORIES.values() for ext in exts}
+    ext_names = list(extensions)
+    ext_weights = [extensions[ext] for ext in ext_names]
+    folders = corpus_folders(root, spec["depth"], spec["fanout"])
+    for folder in folders:
+        os.makedirs(folder, exist_ok=True)
+
+    total = 0
+    names = []
+    for i in range(spec["files"]):
+        if names and rng.random() < spec["collision_rate"]:
+            # Another folder sorts into the same place; in a flat tree, an existing destination file
+            name = rng.choice(names)
+            free = [f for f in rng.sample(folders, min(4, len(folders)))
+                    if not os.path.exists(os.path.join(f, name))]
+            folder = free[0] if free else os.path.join(root, classify(name))
+            os.makedirs(folder, exist_ok=True)
+        else:
+            if rng.random() < spec["unknown_rate"]:
+                ext = rng.choice(UNKNOWN_EXTENSIONS)
+            else:
+                ext = rng.choices(ext_names, ext_weights)[0]
+            name = f"f{i}{ext}"
+            names.append(name)
+            folder = rng.choice(folders)
+
+        size = min(spec["size_max"], int(rng.lognormvariate(0, spec["size_sigma"]) * spec["size_median"]))
+        path = os.path.join(folder, name)
+        with open(path, "wb") as f:
+            if os.path.splitext(name)[1] in UNKNOWN_EXTENSIONS and rng.random() < 0.5:
+                offset, magic, _ = rng.choice(SIGNATURES)
+                f.write(b"\0" * offset + magic)
+            f.truncate(max(size, f.tell()))
+        total += max(size, 0)
+    return total
+
+
+def syscall_counts():
+    """Read and write syscalls made by this process so far (Linux only)
+
+    /proc/self/io counts read- and write-family calls only; stat, rename
+    and directory listing do not show up here.
+    """
+    try:
+        with open("/proc/self/io", "r") as f:
+            fields = dict(line.split(":", 1) for line in f)
+    except OSError:
+        return None
+    return {"read": int(fields["syscr"]), "write": int(fields["syscw"])}
+
+
+def peak_rss_kb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+class StageTimer:
+    """Time one stage and the syscalls it made"""
+
+    def __init__(self, results, name):
+        self.results = results
+        self.name = name
+        self.files = 0
+
+    def __enter__(self):
+        self.syscalls = syscall_counts()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        after = syscall_counts()
+        syscalls = None
+        if self.syscalls is not None and after is not None:
+            syscalls = {kind: after[kind] - self.syscalls[kind] for kind in after}
+        self.results[self.name] = {
+            "files": self.files,
+            "seconds": round(seconds, 6),
+            "files_per_s": round(self.files / seconds, 1) if seconds > 0 else None,
+            "syscalls": syscalls,
+            "peak_rss_kb": peak_rss_kb(),
+        }
+
+
+def run_benchmark(spec, workdir=None, journal_kind="db", workers=1, sniff=True, keep=False):
+    """Generate a corpus, run every pipeline stage on it once and return the report dict
+
+    The stages run separately: move executes the plan without a journal,
+    journal then records the completed moves, and undo restores them.
+    """
+    base = tempfile.mkdtemp(prefix="pysort-bench-", dir=workdir)
+    root = os.path.join(base, "corpus")
+    try:
+        start = time.perf_counter()
+        total_bytes = generate_corpus(root, spec)
+        generate_seconds = time.perf_counter() - start
+
+        stages = {}
+        walk = WalkOptions() if spec["depth"] else None
+        with StageTimer(stages, "scan") as stage:
+            records = list(scan(root, walk))
+            stage.files = len(records)
+        with StageTimer(stages, "classify") as stage:
+            for record in records:
+                classify_record(record, sniff)
+            stage.files = len(records)
+        del records
+        with StageTimer(stages, "plan") as stage:
+            moves = list(plan_subdirectory_sort(root, walk=walk, sniff=sniff))
+            stage.files = len(moves)
+
+        done = []
+        with StageTimer(stages, "move") as stage:
+            for move, error in MoveExecutor(workers).run(moves):
+                if error is None:
+                    done.append(move)
+            stage.files = len(done)
+
+        if journal_kind == "db":
+            journal = SessionStore(os.path.join(base, "bench.db"), legacy_log=None)
+        else:
+            journal = Journal(os.path.join(base, "bench_log.txt"))
+        with StageTimer(stages, "journal") as stage:
+            journal.start_session()
+            for move in done:
+                journal.log_operation(move.source, move.destination, move.action)
+            journal.end_session()
+            stage.files = len(done)
+
+        operations = journal.get_last_session_operations()
+        with StageTimer(stages, "undo") as stage:
+            result = undo_operations(operations, journal, workers)
+            stage.files = result.restored
+        if hasattr(journal, "close"):
+            journal.close()
+    finally:
+        if not keep:
+            shutil.rmtree(base, ignore_errors=True)
+
+    return {
+        "corpus": dict(spec, bytes=total_bytes, generate_seconds=round(generate_seconds, 6),
+                       path=root if keep else None),
+        "settings": {"journal": journal_kind, "workers": workers, "sniff": sniff},
+        "platform": {"python": platform.python_version(), "system": platform.system(),
+                     "machine": platform.machine()},
+        "stages": stages,
+        "errors": len(moves) - len(done) + result.errors,
+    }
+
+
+def add_bench_arguments(parser):
+    parser.add_argument("--files", type=int, help=f"files to generate (default: {DEFAULT_CORPUS['files']})")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--size-median", type=int, metavar="BYTES")
+    parser.add_argument("--size-sigma", type=float, help="spread of the log-normal file sizes")
+    parser.add_argument("--size-max", type=int, metavar="BYTES")
+    parser.add_argument("--unknown-rate", type=float, help="share of files with an unhelpful extension")
+    parser.add_argument("--depth", type=int, help="folder levels below the corpus root")
+    parser.add_argument("--fanout", type=int, help="subfolders per folder")
+    parser.add_argument("--collision-rate", type=float, help="share of files reusing another file's name")
+    parser.add_argument("--ext", action="append", metavar="EXT[=WEIGHT]",
+                        help="extension to generate, may be repeated (defaults to every known one)")
+    parser.add_argument("--journal", choices=("db", "text"), default="db")
+    parser.add_argument("--dir", help="where to create the corpus (defaults to the temp folder)")
+    parser.add_argument("--keep", action="store_true", help="leave the corpus on disk")
+    parser.add_argument("--no-sniff", dest="sniff", action="store_false")
+    parser.add_argument("--output", metavar="FILE", help="write the JSON report here instead of stdout")
+
+
+def bench(args):
+    extensions = None
+    if args.ext:
+        extensions = {}
+        for item in args.ext:
+            ext, _, weight = item.partition("=")
+            extensions[ext if ext.startswith(".") else "." + ext] = float(weight or 1)
+    spec = corpus_spec(files=args.files, seed=args.seed, size_median=args.size_median,
+                       size_sigma=args.size_sigma, size_max=args.size_max, unknown_rate=args.unknown_rate,
+                       depth=args.depth, fanout=args.fanout, collision_rate=args.collision_rate,
+                       extensions=extensions)
+    report = run_benchmark(spec, args.dir, args.journal, args.workers, args.sniff, args.keep)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 1 if report["errors"] else 0
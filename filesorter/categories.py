@@ -0,0 +1,90 @@
+import os
+from pathlib import Path
+from types import MappingProxyType
+
+# Define file categories
+FILE_CATEGORIES = {
+    "Documents": [".pdf", ".docx", ".txt", ".xlsx", ".pptx", ".doc", ".rtf", ".csv", ".odt"],
+    "Images": [".jpg", ".png", ".jpeg", ".gif", ".bmp", ".tiff", ".svg", ".webp", ".heic"],
+    "Videos": [".mp4", ".avi", ".mkv", ".mov", ".wmv", ".flv", ".webm", ".m4v", ".mpg"],
+    "Music": [".mp3", ".wav", ".aac", ".flac", ".ogg", ".wma", ".m4a", ".opus"],
+    "Archives": [".zip", ".rar", ".tar", ".7z", ".gz", ".bz2", ".xz", ".iso",
+                 ".tar.gz", ".tar.bz2", ".tar.xz", ".tgz"],
+    "Executables": [".exe", ".msi", ".bat", ".sh", ".app", ".dmg", ".pkg"],
+    "Code": [
+        # Source code files
+        ".py", ".java", ".c", ".cpp", ".h", ".hpp", ".cs", ".js", ".ts",
+        ".php", ".rb", ".go", ".swift", ".kt", ".scala", ".m", ".pl",
+        # Web files
+        ".html", ".htm", ".css", ".scss", ".sass", ".less", ".jsx", ".tsx",
+        # Configuration files
+        ".json", ".yml", ".yaml", ".xml", ".toml", ".ini", ".cfg", ".conf",
+        # Script files
+        ".sh", ".bash", ".zsh", ".ps1", ".bat", ".cmd",
+        # Build/development files
+        ".md", ".markdown", ".rst", ".dockerfile", ".gitignore", ".gitattributes",
+        # Data files
+        ".sql", ".db", ".sqlite", ".dump",
+        # Other development files
+        ".ipynb", ".env", ".lock"
+    ],
+    "Others": []
+}
+
+OTHERS = "Others"
+
+# Windows special folders
+WINDOWS_FOLDERS = {
+    "Documents": Path(os.path.expandvars("%USERPROFILE%")) / "Documents",
+    "Pictures": Path(os.path.expandvars("%USERPROFILE%")) / "Pictures",
+    "Videos": Path(os.path.expandvars("%USERPROFILE%")) / "Videos",
+    "Music": Path(os.path.expandvars("%USERPROFILE%")) / "Music",
+}
+
+# Which Windows special folder each category is sent to
+WINDOWS_CATEGORY_FOLDERS = {
+    "Documents": "Documents",
+    "Images": "Pictures",
+    "Videos": "Videos",
+    "Music": "Music",
+}
+
+
+class ExtensionIndex:
+    """Frozen extension -> category table, built once per set of categories
+
+    When an extension is listed under several categories the one that comes
+    first in the mapping wins, so ".sh" and ".bat" are Executables rather than
+    Code. Multi-part extensions such as ".tar.gz" are matched longest first.
+    """
+
+    def __init__(self, categories):
+        table = {}
+        for category, extensions in categories.items():
+            for ext in extensions:
+                table.setdefault(ext.lower(), category)
+        self.table = MappingProxyType(table)
+        self.max_parts = max((ext.count(".") for ext in table), default=0)
+
+    def lookup(self, filename):
+        """Category of a file name, or None when no extension matches"""
+        name = filename.lower()
+        table = self.table
+        category = None
+        pos = len(name)
+        for _ in range(self.max_parts):
+            pos = name.rfind(".", 0, pos)
+            if pos < 0:
+                break
+            category = table.get(name[pos:], category)
+        return category
+
+
+EXTENSION_INDEX = ExtensionIndex(FILE_CATEGORIES)
+
+
+def rebuild_extension_index(categories=None):
+    """Recompile the shared index after FILE_CATEGORIES has been customised"""
+    global EXTENSION_INDEX
+    EXTENSION_INDEX = ExtensionIndex(FILE_CATEGORIES if categories is None else categories)
+    return EXTENSION_INDEX
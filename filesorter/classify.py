@@ -0,0 +1,27 @@
+import os
+
+from . import categories as _categories
+from .categories import OTHERS
+from .sniff import SNIFFER
+
+
+def classify(filename, index=None):
+    """Return the category a file name belongs to, or Others"""
+    index = index or _categories.EXTENSION_INDEX
+    return index.lookup(filename) or OTHERS
+
+
+def classify_record(record, sniff=True):
+    """Category of a scanned file, sniffing its content only when the extension is unknown"""
+    category = _categories.EXTENSION_INDEX.lookup(record.name)
+    if category is None and sniff:
+        category = SNIFFER.sniff_record(record)
+    return category or OTHERS
+
+
+def classify_path(path, sniff=True):
+    """Category of a file given only its path, sniffing its content when the extension is unknown"""
+    category = _categories.EXTENSION_INDEX.lookup(os.path.basename(path))
+    if category is None and sniff:
+        category = SNIFFER.sniff(path)
+    return category or OTHERS
@@ -0,0 +1,242 @@
+"""Command line entry point: python -m filesorter (runs without tkinter)"""
+
+import argparse
+import sys
+import time
+
+from .bench import add_bench_arguments, bench
+from .categories import FILE_CATEGORIES
+from .dedup import DEDUP_MODES, HashCache, dedupe
+from .engine import (
+    execute_plan,
+    plan_custom_sort,
+    plan_subdirectory_sort,
+    plan_windows_sort,
+    undo_operations,
+)
+from .jobs import format_summary, job_operations, load_jobs, run_jobs
+from .metrics import Metrics
+from .naming import CONFLICT_POLICIES
+from .planner import dry_run, read_plan, write_plan
+from .recovery import resume_session, rollback_session
+from .rules import RuleSet
+from .scanner import SYMLINK_POLICIES, WalkOptions
+from .store import DB_FILE, SessionStore
+from .watch import POLL_INTERVAL, SETTLE_SECONDS, Watcher
+
+
+def add_walk_arguments(parser):
+    parser.add_argument("-r", "--recursive", action="store_true", help="also sort files in subfolders")
+    parser.add_argument("--max-depth", type=int, help="how many folder levels to descend when recursive")
+    parser.add_argument("--exclude", action="append", default=[], metavar="GLOB",
+                        help="skip files and folders matching this glob, may be repeated")
+    parser.add_argument("--symlinks", choices=SYMLINK_POLICIES, default="files",
+                        help="skip links, sort linked files only, or follow linked folders too")
+
+
+def add_plan_arguments(parser):
+    parser.add_argument("--rules", metavar="FILE",
+                        help="TOML or JSON rules file deciding where files go (sort and custom only)")
+    parser.add_argument("--no-sniff", dest="sniff", action="store_false",
+                        help="put files with unknown extensions in Others without reading their content")
+    parser.add_argument("--dedup", choices=DEDUP_MODES,
+                        help="skip, hardlink or move to Duplicates/ files identical to one already sorted")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be moved")
+    parser.add_argument("--plan-out", metavar="FILE",
+                        help="write the plan to FILE without moving anything (run it later with run-plan)")
+
+
+def walk_options(args):
+    if not args.recursive:
+        return None
+    return WalkOptions(args.max_depth, tuple(args.exclude), args.symlinks)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="pysort", description="Sort files into category folders.")
+    parser.add_argument("--db", default=DB_FILE, help="session store to record moves in")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="threads for cross-device copies (default: 1, serial)")
+    parser.add_argument("--on-conflict", choices=CONFLICT_POLICIES, default="rename",
+                        help="what to do when the destination name is taken (default: rename)")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="append a JSON-lines report of each session's stage timings and counters")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    sort_cmd = commands.add_parser("sort", help="sort files into subfolders of the source folder")
+    sort_cmd.add_argument("source")
+    add_walk_arguments(sort_cmd)
+    add_plan_arguments(sort_cmd)
+
+    custom_cmd = commands.add_parser("custom", help="sort selected file types to a custom directory")
+    custom_cmd.add_argument("source")
+    custom_cmd.add_argument("--dest", help="destination folder (defaults to the source folder)")
+    custom_cmd.add_argument("--category", action="append", choices=list(FILE_CATEGORIES),
+                            help="category to sort, may be repeated (defaults to all)")
+    limit = custom_cmd.add_mutually_exclusive_group()
+    limit.add_argument("--first", type=int, help="sort only the first N files")
+    limit.add_argument("--last", type=int, help="sort only the last N files")
+    add_walk_arguments(custom_cmd)
+    add_plan_arguments(custom_cmd)
+
+    windows_cmd = commands.add_parser("windows", help="sort files to the Windows special folders")
+    windows_cmd.add_argument("source")
+    add_walk_arguments(windows_cmd)
+    add_plan_arguments(windows_cmd)
+
+    watch_cmd = commands.add_parser("watch", help="keep sorting new files as they arrive in a folder")
+    watch_cmd.add_argument("source")
+    watch_cmd.add_argument("--dest", help="destination folder (defaults to the source folder)")
+    watch_cmd.add_argument("--category", action="append", choices=list(FILE_CATEGORIES),
+                           help="category to sort, may be repeated (defaults to all)")
+    watch_cmd.add_argument("--settle", type=float, default=SETTLE_SECONDS,
+                           help="seconds a file must stay unchanged before it is sorted")
+    watch_cmd.add_argument("--poll", action="store_true", help="poll the folder instead of using inotify")
+    watch_cmd.add_argument("--interval", type=float, default=POLL_INTERVAL, help="seconds between polls")
+    watch_cmd.add_argument("--initial", action="store_true", help="sort the files already there first")
+    watch_cmd.add_argument("--no-sniff", dest="sniff", action="store_false",
+                           help="put files with unknown extensions in Others without reading their content")
+
+    run_plan_cmd = commands.add_parser("run-plan", help="execute a plan written with --plan-out")
+    run_plan_cmd.add_argument("plan")
+
+    recover_cmd = commands.add_parser("recover", help="list, resume or roll back interrupted sessions")
+    recover_action = recover_cmd.add_mutually_exclusive_group()
+    recover_action.add_argument("--resume", metavar="SESSION", help="finish the session's outstanding moves")
+    recover_action.add_argument("--rollback", metavar="SESSION", help="undo everything the session did")
+
+    jobs_cmd = commands.add_parser("jobs", help="run a TOML or JSON file of sort jobs, disks in parallel")
+    jobs_cmd.add_argument("file")
+    jobs_cmd.add_argument("--job", action="append", metavar="NAME", help="run only this job, may be repeated")
+
+    undo_cmd = commands.add_parser("undo", help="undo the last sort session")
+    undo_target = undo_cmd.add_mutually_exclusive_group()
+    undo_target.add_argument("--session", help="undo this session instead of the last one")
+    undo_target.add_argument("--job", metavar="NAME", help="undo the last run of this batch job")
+
+    sessions_cmd = commands.add_parser("sessions", help="list recent sort sessions")
+    sessions_cmd.add_argument("--limit", type=int, default=20)
+
+    bench_cmd = commands.add_parser("bench", help="time every pipeline stage on a generated corpus (JSON report)")
+    add_bench_arguments(bench_cmd)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == "bench":
+        return bench(args)
+    journal = SessionStore(args.db)
+    metrics = Metrics(args.metrics) if args.metrics else None
+
+    if args.command == "sessions":
+        for session in journal.list_sessions(args.limit):
+            status = "undone" if session["undone"] else f"{session['moved']} moved, {session['errors']} errors"
+            label = f"  [{session['label']}]" if session["label"] else ""
+            print(f"{session['id']}  {session['started']}  {status}{label}")
+        return 0
+
+    if args.command == "recover":
+        if args.resume:
+            return report(resume_session(journal, args.resume, args.workers, args.on_conflict, metrics))
+        if args.rollback:
+            result = rollback_session(journal, args.rollback, args.workers, metrics)
+            print(f"Successfully undone {result.restored} files, errors: {result.errors}, missing: {result.missing}")
+            return 1 if result.errors else 0
+        for session in journal.interrupted_sessions():
+            print(f"{session['id']}  {session['started']}  {session['pending']} moves outstanding")
+        return 0
+
+    if args.command == "undo":
+        if args.session:
+            operations = journal.get_session_operations(args.session)
+        elif args.job:
+            operations = job_operations(journal, args.job)
+        else:
+            operations = journal.get_last_session_operations()
+        if not operations:
+            print("No operations to undo!")
+            return 0
+        result = undo_operations(operations, journal, args.workers, metrics)
+        print(f"Successfully undone {result.restored} files, errors: {result.errors}, missing: {result.missing}")
+        return 1 if result.errors else 0
+
+    if args.command == "watch":
+        return watch(args, journal, metrics)
+
+    if args.command == "jobs":
+        return jobs(args, metrics)
+
+    if args.command == "run-plan":
+        return report(execute_plan(read_plan(args.plan), journal, args.workers, conflict=args.on_conflict,
+                                   metrics=metrics))
+
+    walk = walk_options(args)
+    rules = RuleSet.load(args.rules, sniff=args.sniff) if args.rules else None
+    output_folder = args.source
+    if args.command == "sort":
+        moves = plan_subdirectory_sort(args.source, walk=walk, sniff=args.sniff, rules=rules, metrics=metrics)
+    elif args.command == "custom":
+        moves = plan_custom_sort(args.source, args.dest, args.category, args.first, args.last,
+                                 walk=walk, sniff=args.sniff, rules=rules, metrics=metrics)
+        output_folder = args.dest or args.source
+    else:
+        # The special folders are shared, so duplicates are set aside in the source folder
+        moves = plan_windows_sort(args.source, walk=walk, sniff=args.sniff, metrics=metrics)
+
+    if args.dedup:
+        cache = HashCache()
+        moves = dedupe(moves, args.dedup, cache, output_folder)
+        cache.close()
+
+    if args.plan_out:
+        print(write_plan(moves, args.plan_out).format())
+        return 0
+    if args.dry_run:
+        print(dry_run(moves)[1].format())
+        return 0
+
+    return report(execute_plan(moves, journal, args.workers, conflict=args.on_conflict, metrics=metrics))
+
+
+def watch(args, journal, metrics=None):
+    if args.initial:
+        report(execute_plan(plan_custom_sort(args.source, args.dest, args.category, sniff=args.sniff,
+                                             metrics=metrics),
+                            journal, args.workers, conflict=args.on_conflict, metrics=metrics))
+    watcher = Watcher(args.source, journal, args.dest, args.category, sniff=args.sniff,
+                      workers=args.workers, conflict=args.on_conflict, settle=args.settle,
+                      poll_interval=args.interval, use_inotify=False if args.poll else None,
+                      metrics=metrics)
+    print(f"Watching {args.source}, press Ctrl+C to stop")
+    try:
+        watcher.run(on_batch=lambda moved, errors, skipped: print(
+            f"Moved {moved} files, skipped: {skipped}, errors: {errors}"))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def jobs(args, metrics=None):
+    batch = load_jobs(args.file)
+    if args.job:
+        unknown = set(args.job) - {job.name for job in batch}
+        if unknown:
+            print(f"Unknown jobs: {', '.join(sorted(unknown))}")
+            return 2
+        batch = [job for job in batch if job.name in args.job]
+    start_time = time.time()
+    results = run_jobs(batch, args.db, args.workers, args.on_conflict, metrics,
+                       on_job=lambda result: print(f"Finished {result.name}: {result.moved} moved"))
+    print(format_summary(results, time.time() - start_time))
+    return 1 if any(result.errors for result in results) else 0
+
+
+def report(result):
+    print(f"Total files moved: {result.moved}, skipped: {result.skipped}, errors: {result.errors}, "
+          f"time taken: {result.time_taken:.2f} seconds")
+    return 1 if result.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
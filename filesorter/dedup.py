@@ -0,0 +1,173 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import defaultdict
+
+# Constants
+HASH_CACHE_FILE = "hash_cache.db"
+PARTIAL_BLOCK = 64 << 10
+READ_CHUNK = 1 << 20
+DUPLICATES = "Duplicates"
+DEDUP_MODES = ("skip", "link", "move")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS hashes (
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    partial TEXT,
+    full TEXT,
+    PRIMARY KEY (path, size, mtime_ns, inode)
+);
+"""
+
+
+class HashCache:
+    """Persistent partial/full content hashes keyed on (path, size, mtime, inode)"""
+
+    def __init__(self, path=HASH_CACHE_FILE):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.lock = threading.Lock()
+        self.pending = {}
+
+    def get(self, key):
+        if key in self.pending:
+            return self.pending[key]
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT partial, full FROM hashes WHERE path = ? AND size = ? AND mtime_ns = ? AND inode = ?",
+                key).fetchone()
+        return row or (None, None)
+
+    def put(self, key, partial=None, full=None):
+        old_partial, old_full = self.get(key)
+        self.pending[key] = (partial or old_partial, full or old_full)
+
+    def flush(self):
+        if not self.pending:
+            return
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO hashes (path, size, mtime_ns, inode, partial, full) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [key + value for key, value in self.pending.items()])
+        self.pending = {}
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+
+def hash_file(path, limit=None):
+    """blake2b of a file, or of its first `limit` bytes"""
+    digest = hashlib.blake2b(digest_size=20)
+    remaining = limit
+    with open(path, "rb") as f:
+        while remaining is None or remaining > 0:
+            chunk = f.read(READ_CHUNK if remaining is None else min(READ_CHUNK, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+    return digest.hexdigest()
+
+
+def _cached_hash(cache, key, path, partial):
+    cached_partial, cached_full = cache.get(key) if cache else (None, None)
+    if partial:
+        if cached_partial is None:
+            cached_partial = hash_file(path, PARTIAL_BLOCK)
+            if cache:
+                cache.put(key, partial=cached_partial)
+        return cached_partial
+    if cached_full is None:
+        cached_full = hash_file(path)
+        if cache:
+            cache.put(key, full=cached_full)
+    return cached_full
+
+
+def find_duplicates(moves, cache=None):
+    """Map each duplicate move's index to the index of the first identical file
+
+    Files are grouped by size first, then by a hash of their first block,
+    and only files that still collide are hashed in full.
+    """
+    by_size = defaultdict(list)
+    keys = {}
+    for i, move in enumerate(moves):
+        try:
+            st = os.stat(move.source)
+        except OSError:
+            continue
+        if st.st_size == 0:
+            continue  # Empty placeholders are not worth deduplicating
+        keys[i] = (os.path.abspath(move.source), st.st_size, st.st_mtime_ns, st.st_ino)
+        by_size[st.st_size].append(i)
+
+    duplicates = {}
+    for size, group in by_size.items():
+        if len(group) < 2:
+            continue
+        by_partial = defaultdict(list)
+        for i in group:
+            try:
+                by_partial[_cached_hash(cache, keys[i], moves[i].source, True)].append(i)
+            except OSError:
+                continue
+        for candidates in by_partial.values():
+            if len(candidates) < 2:
+                continue
+            if size <= PARTIAL_BLOCK:
+                by_full = {None: candidates}
+            else:
+                by_full = defaultdict(list)
+                for i in candidates:
+                    try:
+                        by_full[_cached_hash(cache, keys[i], moves[i].source, False)].append(i)
+                    except OSError:
+                        continue
+            for same in by_full.values():
+                for i in same[1:]:
+                    duplicates[i] = same[0]
+
+    if cache:
+        cache.flush()
+    return duplicates
+
+
+def dedupe(moves, mode="move", cache=None, output_folder=None):
+    """Rewrite a plan so byte-identical copies are skipped, hardlinked or set aside
+
+    The first copy of each file is moved as planned. Later copies are
+    dropped from the plan ("skip"), replaced by a hard link to wherever
+    the first copy ends up ("link"), or moved into the Duplicates folder
+    of output_folder, the folder the sort writes into ("move"). The
+    action is carried on the move so the journal can undo it.
+    """
+    if mode not in DEDUP_MODES:
+        raise ValueError(f"Unknown dedup mode: {mode}")
+    if mode == "move" and output_folder is None:
+        raise ValueError("Moving duplicates aside needs the sort's output folder")
+    moves = list(moves)
+    duplicates = find_duplicates(moves, cache)
+
+    plan = []
+    links = []
+    for i, move in enumerate(moves):
+        original = duplicates.get(i)
+        if original is None:
+            plan.append(move)
+        elif mode == "link":
+            links.append(move._replace(action="link", origin=moves[original].source))
+        elif mode == "move":
+            plan.append(move._replace(destination=os.path.join(output_folder, DUPLICATES,
+                                                               os.path.basename(move.destination)),
+                                      category=DUPLICATES))
+    # Links go last so every first copy is already in place when they run
+    return plan + links
@@ -0,0 +1,341 @@
+"""Plan, execute and journal file sorts without any GUI dependency"""
+
+import os
+import re
+import shutil
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from .categories import (
+    FILE_CATEGORIES,
+    WINDOWS_CATEGORY_FOLDERS,
+    WINDOWS_FOLDERS,
+)
+from . import scanner
+from .classify import classify_record
+from .dedup import DUPLICATES
+from .executor import MoveExecutor
+from .naming import ConflictSkipped
+from .rules import RuleSet
+from .scanner import scan_files, walk_files
+
+# A single planned file move. action is "move", or "link" for a duplicate
+# replaced by a hard link to the moved first copy, whose source is origin
+Move = namedtuple("Move", ["source", "destination", "category", "action", "origin"],
+                  defaults=("move", None))
+
+# Outcome of executing a plan
+SortResult = namedtuple("SortResult", ["moved", "errors", "time_taken", "cancelled", "skipped"],
+                        defaults=(False, 0))
+
+# Outcome of undoing a session
+UndoResult = namedtuple("UndoResult", ["restored", "errors", "missing"], defaults=(0,))
+
+
+def scan(folder, walk=None, output_dirs=(), metrics=None, output_pattern=None):
+    """Files directly in a folder, or the whole tree when walk options are given"""
+    if walk is None:
+        records = scan_files(folder)
+    else:
+        records = walk_files(folder, walk, skip_dirs=output_dirs, skip_pattern=output_pattern)
+    if metrics is not None:
+        records = metrics.timed(records, "scan")
+    return records
+
+
+def output_dirs_for(folder, rules):
+    """Folders a sort into `folder` writes to, which a recursive walk must not enter"""
+    roots = set(FILE_CATEGORIES) | rules.output_roots() | {DUPLICATES}
+    return [os.path.join(folder, root) for root in roots]
+
+
+def output_pattern_for(folder, rules):
+    """Regex for the templated folders (such as {year}) a sort into `folder` writes to, or None"""
+    patterns = rules.output_patterns()
+    if not patterns:
+        return None
+    prefix = re.escape(os.path.join(os.path.normcase(os.path.abspath(folder)), ""))
+    return re.compile(f"{prefix}(?:{'|'.join(patterns)})", re.IGNORECASE)
+
+
+def same_path(a, b):
+    return os.path.normcase(os.path.abspath(a)) == os.path.normcase(os.path.abspath(b))
+
+
+def plan_subdirectory_sort(source_folder, walk=None, sniff=True, rules=None, metrics=None):
+    """Plan moving every file into a category folder inside the source folder
+
+    Moves are produced lazily, so a recursive sort starts moving files
+    before the walk has finished. rules, a RuleSet, replaces the plain
+    one-folder-per-category layout. metrics, a Metrics, times the scan.
+    A file that is already where it would be sorted to is left out.
+    """
+    rules = rules or RuleSet([], sniff=sniff)
+    now = time.time()
+    records = scan(source_folder, walk, output_dirs_for(source_folder, rules), metrics,
+                   output_pattern_for(source_folder, rules))
+    for record in records:
+        target = rules.match(record, now)
+        if target is not None:
+            label, folder = target
+            destination = os.path.join(source_folder, folder, record.name)
+            if not same_path(record.path, destination):
+                yield Move(record.path, destination, label)
+
+
+def plan_custom_sort(source_folder, dest_folder=None, selected_categories=None,
+                     first_n=None, last_n=None, walk=None, sniff=True, rules=None, metrics=None):
+    """Plan a sort limited to some categories and optionally the first/last N files"""
+    dest_folder = dest_folder or source_folder
+    if selected_categories is None:
+        selected_categories = list(FILE_CATEGORIES)
+    rules = rules or RuleSet([], sniff=sniff)
+    now = time.time()
+
+    records = scan(source_folder, walk, output_dirs_for(dest_folder, rules), metrics,
+                   output_pattern_for(dest_folder, rules))
+    if first_n:
+        records = scanner.first_n(records, first_n)
+    elif last_n:
+        records = scanner.last_n(records, last_n)
+
+    for record in records:
+        if classify_record(record, sniff) not in selected_categories:
+            continue
+        target = rules.match(record, now)
+        if target is not None:
+            label, folder = target
+            destination = os.path.join(dest_folder, folder, record.name)
+            if not same_path(record.path, destination):
+                yield Move(record.path, destination, label)
+
+
+def plan_windows_sort(source_folder, windows_folders=WINDOWS_FOLDERS, walk=None, sniff=True, metrics=None):
+    """Plan moving files into the matching Windows special folders"""
+    output_dirs = [str(folder) for folder in windows_folders.values()] + [os.path.join(source_folder, DUPLICATES)]
+    for record in scan(source_folder, walk, output_dirs, metrics):
+        category = classify_record(record, sniff)
+        destination_folder = windows_folders.get(WINDOWS_CATEGORY_FOLDERS.get(category))
+        if destination_folder:
+            destination = os.path.join(str(destination_folder), record.name)
+            if not same_path(record.path, destination):
+                yield Move(record.path, destination, category)
+
+
+def execute_plan(moves, journal, workers=1, progress=None, cancel=None, conflict="rename", metrics=None):
+    """Carry out planned moves as one journal session
+
+    progress, if given, is called as progress(done, errors) after every
+    move. Setting the cancel event stops the sort after the moves already
+    in flight; everything that did move is journaled. conflict is the
+    policy for destination names that are already taken (see naming).
+    metrics, a Metrics, receives the session's report when it ends.
+    """
+    session_id = journal.start_session()
+    start_time = time.time()
+    counts = (0, 0, 0)
+    interrupted = True
+
+    try:
+        executor = MoveExecutor(workers, conflict=conflict, metrics=metrics)
+        counts = execute_moves(moves, journal, executor, progress, cancel, metrics)
+        interrupted = False
+    finally:
+        moved, errors, skipped = counts
+        cancelled = cancel is not None and cancel.is_set()
+        result = SortResult(moved, errors, time.time() - start_time, cancelled, skipped)
+        if metrics is not None:
+            metrics.enter("journal")
+        journal.end_session(result, interrupted)
+        if metrics is not None:
+            metrics.finish("sort", result, session_id)
+
+    return result
+
+
+def execute_moves(moves, journal, executor, progress=None, cancel=None, metrics=None):
+    """Run moves through an executor into the journal's open session
+
+    Returns (moved, errors, skipped).
+    """
+    moved = 0
+    errors = 0
+    skipped = 0
+    if metrics is not None:
+        # Whatever the plan generator does beyond scanning is classification
+        moves = metrics.timed(moves, "classify")
+    results = executor.run(moves, cancel, getattr(journal, "write_intents", None),
+                           getattr(journal, "log_dirs", None))
+    if metrics is not None:
+        results = metrics.timed(results, "move")
+        previous = metrics.enter("journal")
+    for move, error in results:
+        if error is None:
+            journal.log_operation(move.source, move.destination, move.action)
+            moved += 1
+        elif isinstance(error, ConflictSkipped):
+            skipped += 1
+        else:
+            print(f"Error moving {os.path.basename(move.source)}: {error}")
+            errors += 1
+            if metrics is not None:
+                metrics.error(error)
+        if progress is not None:
+            progress(moved + errors + skipped, errors)
+    if metrics is not None:
+        metrics.count("skipped", skipped)
+        metrics.enter(previous)
+    return moved, errors, skipped
+
+
+def restore(chain, measure=False):
+    """Move files back to one source path, newest journal entry first
+
+    Returns (op, outcome, moved) triples, where outcome is "restored",
+    "missing" or the exception that stopped the file from being restored.
+    When measuring, moved is ("renames" or "copies", size) for a file
+    that was actually moved, otherwise None.
+    """
+    results = []
+    for op in chain:
+        try:
+            if not os.path.lexists(op["destination"]):
+                # Already back from an earlier undo that was cut short, or deleted since
+                results.append((op, "restored" if os.path.lexists(op["source"]) else "missing", None))
+                continue
+            moved = None
+            if measure:
+                st = os.lstat(op["destination"])
+                same_device = st.st_dev == os.stat(os.path.dirname(op["source"])).st_dev
+                copied = op.get("action") == "link" or not same_device
+                moved = ("copies" if copied else "renames", st.st_size)
+            if op.get("action") == "link":
+                # Give the duplicate its own copy again rather than a shared inode
+                shutil.copy2(op["destination"], op["source"])
+                os.remove(op["destination"])
+            else:
+                shutil.move(op["destination"], op["source"])
+            results.append((op, "restored", moved))
+        except Exception as e:
+            results.append((op, e, None))
+    return results
+
+
+def session_folders(journal, session_id, operations=()):
+    """Folders undo may remove once they are empty
+
+    A store that records the folders a session created gives exactly
+    those, nested rule folders included; with the text journal it is the
+    folder of every undone move, as before.
+    """
+    session_dirs = getattr(journal, "session_dirs", None)
+    if session_dirs is not None:
+        return session_dirs(session_id)
+    return {os.path.dirname(op["destination"]) for op in operations}
+
+
+def remove_empty_dirs(folders):
+    """rmdir every folder that is empty, deepest first so parents empty out after their children"""
+    for folder in sorted(set(folders), key=len, reverse=True):
+        try:
+            os.rmdir(folder)
+        except OSError:
+            pass  # Directory not empty or other error
+
+
+def undo_operations(operations, journal, workers=1, metrics=None, progress=None, cancel=None):
+    """Move the files of a journal session back where they came from
+
+    Operations are grouped by source path (a path sorted twice is restored
+    newest first) and the groups run on a pool of workers. Source folders
+    are created, and emptied destination folders removed, once each.
+    Only operations that were actually undone leave the journal, so an
+    undo that fails or stops partway can simply be run again.
+
+    progress(done, errors) and the cancel event work as in execute_plan;
+    groups not started when cancel is set are left in the journal.
+    """
+    if not operations:
+        return UndoResult(0, 0)
+
+    measure = metrics is not None
+    if measure:
+        metrics.enter("restore")
+    session_id = operations[0]["session"]
+    chains = {}
+    for op in operations:  # most recent first
+        chains.setdefault(op["source"], []).append(op)
+
+    failed_dirs = {}
+    for source_dir in {os.path.dirname(source) for source in chains}:
+        try:
+            os.makedirs(source_dir, exist_ok=True)
+        except OSError as e:
+            failed_dirs[source_dir] = e
+    runnable = []
+    results = []
+    for source, chain in chains.items():
+        error = failed_dirs.get(os.path.dirname(source))
+        if error is None:
+            runnable.append(chain)
+        else:
+            results.extend((op, error, None) for op in chain)
+
+    def restore_chain(chain):
+        if cancel is not None and cancel.is_set():
+            return []
+        return restore(chain, measure)
+
+    failures = len(results)
+
+    def collect(chain_results):
+        nonlocal failures
+        results.extend(chain_results)
+        if progress is not None:
+            failures += sum(1 for _, outcome, _ in chain_results if not isinstance(outcome, str))
+            progress(len(results), failures)
+
+    if workers > 1 and len(runnable) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for chain_results in pool.map(restore_chain, runnable):
+                collect(chain_results)
+    else:
+        for chain in runnable:
+            collect(restore_chain(chain))
+
+    done = []
+    success_count = error_count = missing_count = 0
+    for op, outcome, moved in results:
+        if outcome == "restored":
+            success_count += 1
+            done.append(op)
+            if moved is not None:
+                metrics.count(moved[0])
+                metrics.count("bytes", moved[1])
+        elif outcome == "missing":
+            print(f"Nothing to undo for {op['destination']}: file no longer exists")
+            missing_count += 1
+            done.append(op)
+        else:
+            print(f"Error undoing {op['destination']}: {outcome}")
+            error_count += 1
+            if measure:
+                metrics.error(outcome)
+
+    if measure:
+        metrics.enter("cleanup")
+
+    remove_empty_dirs(session_folders(journal, session_id, done))
+
+    if measure:
+        metrics.enter("journal")
+    if error_count == 0 and len(done) == len(operations):
+        journal.remove_session(session_id)
+    elif done:
+        journal.remove_operations(session_id, done)
+
+    result = UndoResult(success_count, error_count, missing_count)
+    if measure:
+        metrics.finish("undo", result, session_id)
+    return result
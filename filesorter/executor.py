@@ -0,0 +1,204 @@
+import os
+import shutil
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+from threading import BoundedSemaphore
+
+from .naming import NameIndex
+
+# Constants
+DEFAULT_WORKERS = 8
+LARGE_FILE_BYTES = 64 << 20   # copies at least this big count against max_large_copies
+MAX_LARGE_COPIES = 2
+INTENT_BATCH = 512            # moves resolved (and recorded as intents) ahead of running them
+
+
+def _done(error=None):
+    future = Future()
+    if error is None:
+        future.set_result(None)
+    else:
+        future.set_exception(error)
+    return future
+
+
+class MoveExecutor:
+    """Carry out planned moves, copying across devices on a thread pool
+
+    Moves that stay on one filesystem are plain renames and run inline.
+    Cross-device moves (a full copy plus delete) go to the pool, with at
+    most max_large_copies big files in flight at once. Results are yielded
+    in plan order so the journal stays ordered.
+
+    Destination names are resolved against a NameIndex a batch at a time,
+    and each resolved batch is handed to intent_log (if given) before any
+    of it runs, so a crash leaves a record of exactly what was under way.
+    Likewise dir_log gets every folder the executor is about to create.
+    The yielded move carries the name the file actually ended up with.
+    A duplicate's link is only made to a first copy that this run really
+    moved; when that move failed or was skipped the duplicate is moved
+    like any other file instead.
+
+    metrics, a Metrics, gets resolve and intent time plus counts of
+    renames, copies, links and bytes moved.
+    """
+
+    def __init__(self, workers=1, max_large_copies=MAX_LARGE_COPIES, conflict="rename", metrics=None):
+        self.names = NameIndex(conflict)
+        self.workers = max(1, workers)
+        self.window = self.workers * 4
+        self.large_copies = BoundedSemaphore(max(1, max_large_copies))
+        self.created_dirs = set()
+        self.dir_devices = {}
+        self.placed = {}
+        self.metrics = metrics
+        self.dir_log = None
+
+    def prepare_dir(self, dest_dir):
+        """Create a destination folder once and remember which device it is on"""
+        if dest_dir not in self.created_dirs:
+            missing = []
+            folder = dest_dir
+            while folder not in self.created_dirs and not os.path.isdir(folder):
+                missing.append(folder)
+                parent = os.path.dirname(folder)
+                if parent == folder:
+                    break
+                folder = parent
+            if missing and self.dir_log is not None:
+                self.dir_log(missing)
+            os.makedirs(dest_dir, exist_ok=True)
+            self.created_dirs.add(dest_dir)
+        device = self.dir_devices.get(dest_dir)
+        if device is None and (self.workers > 1 or self.metrics is not None):
+            device = self.dir_devices[dest_dir] = os.stat(dest_dir).st_dev
+        return device
+
+    def copy_move(self, move, size):
+        start = time.perf_counter()
+        if size >= LARGE_FILE_BYTES:
+            with self.large_copies:
+                shutil.move(move.source, move.destination)
+        else:
+            shutil.move(move.source, move.destination)
+        if self.metrics is not None:
+            self.metrics.add_time("copy", time.perf_counter() - start)
+            self.metrics.count("copies")
+            self.metrics.count("bytes", size)
+
+    def moved(self, kind, size):
+        if self.metrics is not None:
+            self.metrics.count(kind)
+            self.metrics.count("bytes", size)
+
+    def resolve(self, move):
+        """Settle the final name, returning (move, error)
+
+        The folder is only created once the move starts, so a session that
+        stops early leaves no empty folders for moves it never ran.
+        """
+        try:
+            destination = self.names.resolve(move.source, move.destination)
+        except Exception as e:
+            return move, e
+        if destination != move.destination:
+            move = move._replace(destination=destination)
+        return move, None
+
+    def resolved(self, moves, intent_log=None):
+        """Resolve moves in batches, recording each batch before it is yielded"""
+        moves = iter(moves)
+        metrics = self.metrics
+        while True:
+            previous = metrics.enter("resolve") if metrics is not None else None
+            batch = [self.resolve(move) for move in islice(moves, INTENT_BATCH)]
+            if batch and intent_log is not None:
+                if metrics is not None:
+                    metrics.enter("journal")
+                intent_log([move for move, error in batch if error is None], self.names.replaced)
+            if metrics is not None:
+                metrics.enter(previous)
+            if not batch:
+                return
+            yield from batch
+
+    def start(self, pool, move):
+        """Run a resolved move inline or hand it to the pool, returning it and its future"""
+        try:
+            device = self.prepare_dir(os.path.dirname(move.destination))
+            if move.action == "link":
+                target = self.placed.get(move.origin)
+                if target is not None:
+                    os.link(target, move.destination)
+                    os.remove(move.source)
+                    self.moved("links", 0)
+                    return move, _done()
+                move = move._replace(action="move", origin=None)
+            if pool is None and self.metrics is None:
+                shutil.move(move.source, move.destination)
+                return move, _done()
+            st = os.stat(move.source)
+            same_device = st.st_dev == device
+            if pool is None:
+                shutil.move(move.source, move.destination)
+                self.moved("renames" if same_device else "copies", st.st_size)
+                return move, _done()
+            if same_device:
+                os.replace(move.source, move.destination)
+                self.moved("renames", st.st_size)
+                return move, _done()
+            return move, pool.submit(self.copy_move, move, st.st_size)
+        except Exception as e:
+            return move, _done(e)
+
+    def finished(self, move, future):
+        """(move, error) for a started move, remembering where a successful one put its file"""
+        error = future.exception()
+        if error is None:
+            self.placed[move.source] = move.destination
+        return move, error
+
+    def run(self, moves, cancel=None, intent_log=None, dir_log=None):
+        """Yield (move, error) for every planned move, in plan order
+
+        Once the cancel event is set no further moves are started, but
+        moves already handed to the pool are still waited for and yielded,
+        also when the plan itself raises, so every file that moved reaches
+        the journal before the error does.
+        """
+        self.dir_log = dir_log
+        if self.workers == 1:
+            for move, error in self.resolved(moves, intent_log):
+                if cancel is not None and cancel.is_set():
+                    return
+                if error is None:
+                    move, error = self.finished(*self.start(None, move))
+                yield move, error
+            return
+
+        pending = deque()
+        closing = False
+        with ThreadPoolExecutor(self.workers) as pool:
+            try:
+                for move, error in self.resolved(moves, intent_log):
+                    if cancel is not None and cancel.is_set():
+                        break
+                    if error is not None:
+                        pending.append((move, _done(error)))
+                        continue
+                    if move.action == "link":
+                        # A link needs the first copy in place, so let earlier moves finish
+                        while pending:
+                            yield self.finished(*pending.popleft())
+                    pending.append(self.start(pool, move))
+                    while pending and (len(pending) > self.window or pending[0][1].done()):
+                        yield self.finished(*pending.popleft())
+            except GeneratorExit:
+                # The consumer is gone, so there is no one left to hand results to
+                closing = True
+                raise
+            finally:
+                while pending and not closing:
+                    yield self.finished(*pending.popleft())
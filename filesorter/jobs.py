@@ -0,0 +1,218 @@
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+
+from .categories import FILE_CATEGORIES, WINDOWS_FOLDERS
+from .engine import execute_moves, plan_custom_sort, plan_subdirectory_sort, plan_windows_sort
+from .executor import MoveExecutor
+from .metrics import Metrics
+from .planner import device_of
+from .rules import RuleSet
+from .scanner import SYMLINK_POLICIES, WalkOptions
+from .store import SessionStore
+
+# Constants
+JOB_MODES = ("sort", "windows")
+JOB_KEYS = {"name", "source", "dest", "mode", "categories", "recursive", "max_depth", "exclude",
+            "symlinks", "rules", "sniff"}
+
+# Outcome of one job in a batch; session is the id to undo it by
+JobResult = namedtuple("JobResult", ["name", "source", "session", "moved", "errors", "time_taken", "skipped",
+                                     "failure"], defaults=(0, None))
+
+
+class JobError(ValueError):
+    """Raised for a jobs file that cannot be loaded"""
+
+
+class Job:
+    """One source folder of a batch and how to sort it"""
+
+    def __init__(self, spec, index=0):
+        unknown = set(spec) - JOB_KEYS
+        if unknown:
+            raise JobError(f"Unknown job keys: {', '.join(sorted(unknown))}")
+        if "source" not in spec:
+            raise JobError(f"Job without a source: {spec!r}")
+        self.source = spec["source"]
+        self.name = spec.get("name") or f"{index + 1}:{os.path.basename(os.path.normpath(self.source))}"
+        self.dest = spec.get("dest")
+        self.mode = spec.get("mode", "sort")
+        if self.mode not in JOB_MODES:
+            raise JobError(f"Job {self.name}: unknown mode {self.mode!r}")
+        self.categories = spec.get("categories")
+        if self.categories is not None:
+            unknown = set(self.categories) - set(FILE_CATEGORIES)
+            if unknown:
+                raise JobError(f"Job {self.name}: unknown categories {', '.join(sorted(unknown))}")
+        self.walk = None
+        if spec.get("recursive"):
+            symlinks = spec.get("symlinks", "files")
+            if symlinks not in SYMLINK_POLICIES:
+                raise JobError(f"Job {self.name}: unknown symlink policy {symlinks!r}")
+            self.walk = WalkOptions(spec.get("max_depth"), tuple(spec.get("exclude", ())), symlinks)
+        self.sniff = spec.get("sniff", True)
+        self.rules = RuleSet.load(spec["rules"], sniff=self.sniff) if spec.get("rules") else None
+
+    def output_folders(self):
+        if self.mode == "windows":
+            return [str(folder) for folder in WINDOWS_FOLDERS.values()]
+        return [self.dest or self.source]
+
+    def devices(self):
+        """Every device the job reads from or writes to"""
+        return frozenset([os.stat(self.source).st_dev] + [device_of(folder) for folder in self.output_folders()])
+
+    def plan(self, metrics=None):
+        if self.mode == "windows":
+            return plan_windows_sort(self.source, walk=self.walk, sniff=self.sniff, metrics=metrics)
+        if self.dest is None and self.categories is None:
+            return plan_subdirectory_sort(self.source, self.walk, self.sniff, self.rules, metrics)
+        return plan_custom_sort(self.source, self.dest, self.categories, walk=self.walk, sniff=self.sniff,
+                                rules=self.rules, metrics=metrics)
+
+
+def load_jobs(path):
+    """Jobs from a .toml or .json file: a list of jobs, or a table with
+    a "job" list and "defaults" applied to every job"""
+    if path.endswith(".toml"):
+        import tomllib
+        with open(path, "rb") as f:
+            data = tomllib.load(f)
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    if isinstance(data, list):
+        data = {"job": data}
+    defaults = data.get("defaults", {})
+    jobs = [Job(dict(defaults, **spec), i) for i, spec in enumerate(data.get("job", data.get("jobs", [])))]
+    names = [job.name for job in jobs]
+    if len(set(names)) != len(names):
+        raise JobError("Job names must be unique")
+    return jobs
+
+
+class DeviceScheduler:
+    """Hand out jobs so that no two running jobs touch the same device
+
+    Jobs are started in file order as their devices come free, so
+    separate disks are sorted in parallel while each disk only ever
+    serves one job at a time.
+    """
+
+    def __init__(self, jobs):
+        self.pending = list(jobs)
+        self.busy = set()
+        self.cond = threading.Condition()
+
+    def next_job(self):
+        """(job, devices) to run next, waiting for a device to free up; None once none are left"""
+        with self.cond:
+            while self.pending:
+                for i, (job, devices) in enumerate(self.pending):
+                    if not devices & self.busy:
+                        del self.pending[i]
+                        self.busy |= devices
+                        return job, devices
+                self.cond.wait()
+            return None
+
+    def release(self, devices):
+        with self.cond:
+            self.busy -= devices
+            self.cond.notify_all()
+
+
+def run_job(job, db_path, workers=1, conflict="rename", metrics=None):
+    """Sort one job as its own session (labelled with the job name) in the shared store"""
+    store = SessionStore(db_path, legacy_log=None)
+    session_id = store.start_session(label=job.name)
+    start_time = time.time()
+    counts = (0, 0, 0)
+    interrupted = True
+    try:
+        executor = MoveExecutor(workers, conflict=conflict, metrics=metrics)
+        counts = execute_moves(job.plan(metrics), store, executor, metrics=metrics)
+        interrupted = False
+    finally:
+        moved, errors, skipped = counts
+        result = JobResult(job.name, job.source, session_id, moved, errors, time.time() - start_time, skipped)
+        if metrics is not None:
+            metrics.enter("journal")
+        store.end_session(result, interrupted)
+        store.close()
+        if metrics is not None:
+            metrics.finish("job", result, session_id)
+    return result
+
+
+def run_jobs(jobs, db_path, workers=1, conflict="rename", metrics=None, on_job=None):
+    """Run a batch of jobs, one thread per device group, and return their JobResults in job order
+
+    Every job shares the process's extension index and sniff memo, and
+    journals into the same session store, where it can be undone on its
+    own by name (see job_operations). workers is the copy threads within
+    each job. on_job, if given, is called with each JobResult as it
+    finishes, from the job's thread; metrics gets a report per job.
+    """
+    results = {}
+    schedulable = []
+    for job in jobs:
+        try:
+            schedulable.append((job, job.devices()))
+        except OSError as e:
+            results[job.name] = JobResult(job.name, job.source, None, 0, 1, 0.0, failure=str(e))
+            if on_job is not None:
+                on_job(results[job.name])
+
+    scheduler = DeviceScheduler(schedulable)
+    devices = set().union(*(devices for _, devices in schedulable))
+
+    def worker():
+        while True:
+            picked = scheduler.next_job()
+            if picked is None:
+                return
+            job, job_devices = picked
+            job_metrics = Metrics(metrics.path, metrics.callback) if metrics is not None else None
+            try:
+                result = run_job(job, db_path, workers, conflict, job_metrics)
+            except Exception as e:
+                result = JobResult(job.name, job.source, None, 0, 1, 0.0, failure=str(e))
+            finally:
+                scheduler.release(job_devices)
+            results[job.name] = result
+            if on_job is not None:
+                on_job(result)
+
+    threads = [threading.Thread(target=worker, name=f"pysort-job-{i}")
+               for i in range(min(len(devices), len(schedulable)))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return [results[job.name] for job in jobs]
+
+
+def job_operations(store, name):
+    """Operations of the most recent run of a job that can still be undone"""
+    session_id = store.last_session_id(label=name)
+    if session_id is None:
+        return []
+    return store.get_session_operations(session_id)
+
+
+def format_summary(results, time_taken):
+    """One line per job and a total, for the end of a batch"""
+    lines = []
+    for result in results:
+        status = f"FAILED: {result.failure}" if result.failure else f"session {result.session}"
+        lines.append(f"{result.name:<24} {result.moved:>8} moved {result.skipped:>6} skipped "
+                     f"{result.errors:>6} errors {result.time_taken:>8.2f}s  {status}")
+    moved = sum(result.moved for result in results)
+    skipped = sum(result.skipped for result in results)
+    errors = sum(result.errors for result in results)
+    lines.append(f"{'Total':<24} {moved:>8} moved {skipped:>6} skipped {errors:>6} errors {time_taken:>8.2f}s")
+    return "\n".join(lines)
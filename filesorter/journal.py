@@ -0,0 +1,170 @@
+import os
+import time
+import uuid
+
+# Constants
+LOG_FILE = "sorting_log.txt"
+MAX_UNDO_SESSIONS = 20        # sessions kept when the log is compacted
+COMPACT_LOG_BYTES = 8 << 20   # only compact once the log grows past this size
+FLUSH_EVERY = 512             # buffered operations written per batch
+
+
+class Journal:
+    """Record of file moves, grouped into sessions so they can be undone"""
+
+    def __init__(self, path=LOG_FILE):
+        self.path = path
+        self.current_session_id = None
+        self.pending = []
+
+        # Initialize log file
+        if not os.path.exists(self.path):
+            open(self.path, 'w').close()
+
+    def start_session(self):
+        """Generate a new unique session ID for each sorting operation"""
+        self.end_session()
+        self.current_session_id = str(uuid.uuid4())
+        return self.current_session_id
+
+    def end_session(self, result=None, interrupted=False):
+        """Make the current session durable and compact the log if it got large
+
+        interrupted is accepted for SessionStore compatibility; the text log
+        keeps no intents.
+        """
+        if self.current_session_id is None:
+            return
+        self.flush(sync=True)
+        self.current_session_id = None
+        if os.path.getsize(self.path) > COMPACT_LOG_BYTES:
+            self.compact()
+
+    def log_operation(self, source, destination, action="move"):
+        """Buffer a file move operation with session ID"""
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+        line = f"{timestamp}|{self.current_session_id}|{source}|{destination}"
+        if action != "move":
+            line += f"|{action}"
+        self.pending.append(line + "\n")
+        if len(self.pending) >= FLUSH_EVERY:
+            self.flush()
+
+    def flush(self, sync=False):
+        """Append buffered operations to the log in one write"""
+        if not self.pending:
+            return
+        with open(self.path, "a") as f:
+            f.writelines(self.pending)
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        self.pending = []
+
+    def compact(self, keep_sessions=MAX_UNDO_SESSIONS):
+        """Keep only the most recent complete sessions"""
+        self.flush()
+        with open(self.path, "r") as f:
+            lines = f.readlines()
+
+        # Walk backwards so each session is kept or dropped as a whole
+        kept_sessions = set()
+        kept = []
+        for line in reversed(lines):
+            parts = line.split("|", 2)
+            if len(parts) < 3:
+                continue
+            if parts[1] not in kept_sessions:
+                if len(kept_sessions) >= keep_sessions:
+                    continue
+                kept_sessions.add(parts[1])
+            kept.append(line)
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.writelines(reversed(kept))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def get_last_session_operations(self):
+        """Get all operations from the most recent session"""
+        self.flush()
+        if not os.path.exists(self.path):
+            return []
+
+        with open(self.path, "r") as f:
+            lines = f.readlines()
+
+        if not lines:
+            return []
+
+        # Find the most recent session ID
+        last_session_id = None
+        for line in reversed(lines):
+            parts = line.strip().split("|")
+            if len(parts) >= 3:
+                last_session_id = parts[1]
+                break
+
+        if not last_session_id:
+            return []
+
+        # Get all operations from that session
+        operations = []
+        for line in reversed(lines):
+            parts = line.strip().split("|")
+            if len(parts) >= 4 and parts[1] == last_session_id:
+                operations.append({
+                    "timestamp": parts[0],
+                    "session": parts[1],
+                    "source": parts[2],
+                    "destination": parts[3],
+                    "action": parts[4] if len(parts) >= 5 else "move"
+                })
+
+        return operations
+
+    def get_session_operations(self, session_id):
+        """All operations of a session, most recent first"""
+        self.flush()
+        operations = []
+        with open(self.path, "r") as f:
+            for line in f:
+                parts = line.strip().split("|")
+                if len(parts) >= 4 and parts[1] == session_id:
+                    operations.append({
+                        "timestamp": parts[0],
+                        "session": parts[1],
+                        "source": parts[2],
+                        "destination": parts[3],
+                        "action": parts[4] if len(parts) >= 5 else "move"
+                    })
+        operations.reverse()
+        return operations
+
+    def remove_session(self, session_id):
+        """Drop every operation of a session from the log"""
+        self.flush()
+        with open(self.path, "r") as f:
+            lines = f.readlines()
+
+        # Keep only lines that aren't from this session
+        with open(self.path, "w") as f:
+            for line in lines:
+                parts = line.strip().split("|")
+                if len(parts) < 3 or parts[1] != session_id:
+                    f.write(line)
+
+    def remove_operations(self, session_id, operations):
+        """Drop the given operations of a session, leaving the rest to be undone later"""
+        self.flush()
+        removed = {(op["source"], op["destination"]) for op in operations}
+        with open(self.path, "r") as f:
+            lines = f.readlines()
+
+        with open(self.path, "w") as f:
+            for line in lines:
+                parts = line.strip().split("|")
+                if len(parts) < 4 or parts[1] != session_id or (parts[2], parts[3]) not in removed:
+                    f.write(line)
@@ -0,0 +1,88 @@
+import json
+import threading
+import time
+
+
+class Metrics:
+    """Per-stage timers and counters for sort and undo sessions
+
+    Time is charged to one stage at a time: entering a stage closes the
+    one that was running, so nested stages (the scan inside planning,
+    planning inside the executor) are never counted twice. "copy" is the
+    exception, summed over the worker threads that do cross-device copies.
+
+    Engine functions take metrics=None and skip every measurement when it
+    is not given. When a session ends its report is appended to path as a
+    JSON line and passed to callback, if set.
+    """
+
+    def __init__(self, path=None, callback=None):
+        self.path = path
+        self.callback = callback
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.timers = {}
+        self.counters = {}
+        self.errors = {}
+        self.stage = None
+        self.started = None
+        self.mark = time.perf_counter()
+
+    def enter(self, stage):
+        """Start charging time to stage, returning the stage that was running"""
+        now = time.perf_counter()
+        if self.started is None:
+            self.started = now
+        if self.stage is not None:
+            self.timers[self.stage] = self.timers.get(self.stage, 0.0) + now - self.mark
+        self.mark = now
+        previous, self.stage = self.stage, stage
+        return previous
+
+    def timed(self, iterable, stage):
+        """Yield from iterable, charging the time spent producing each item to stage"""
+        iterator = iter(iterable)
+        while True:
+            previous = self.enter(stage)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.enter(previous)
+            yield item
+
+    def add_time(self, stage, seconds):
+        """Add time measured on another thread"""
+        with self.lock:
+            self.timers[stage] = self.timers.get(stage, 0.0) + seconds
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def error(self, error):
+        """Count an error under its exception type"""
+        category = type(error).__name__
+        with self.lock:
+            self.errors[category] = self.errors.get(category, 0) + 1
+
+    def finish(self, kind, result, session_id=None):
+        """Close the session's report, emit it and start afresh"""
+        self.enter(None)
+        record = {"type": kind, "session": session_id, "finished": time.strftime("%Y-%m-%d %H:%M:%S")}
+        record.update(result._asdict())
+        record["seconds"] = round(self.mark - self.started, 6)
+        record["timers"] = {stage: round(seconds, 6) for stage, seconds in self.timers.items()}
+        record["counters"] = dict(self.counters)
+        record["error_types"] = dict(self.errors)
+        self.reset()
+
+        if self.path:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+        if self.callback is not None:
+            self.callback(record)
+        return record
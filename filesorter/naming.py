@@ -0,0 +1,76 @@
+import os
+
+CONFLICT_POLICIES = ("skip", "rename", "overwrite", "newer")
+
+
+class ConflictSkipped(Exception):
+    """Raised for a move left undone because its destination name was taken"""
+
+
+class NameIndex:
+    """Names present in each destination folder, listed once per folder
+
+    Resolving a conflict never probes the filesystem: taken names are
+    looked up in memory, and the next numeric suffix for each name is
+    remembered so "report (3).pdf" does not retry (1) and (2) again.
+    overwrite and newer only ever replace files that were there before
+    the run; a name already claimed by another move of the same run is
+    renamed instead, so one sorted file never replaces another. replaced
+    holds the destinations that will overwrite a file already there.
+    """
+
+    def __init__(self, policy="rename"):
+        if policy not in CONFLICT_POLICIES:
+            raise ValueError(f"Unknown conflict policy: {policy}")
+        self.policy = policy
+        self.names = {}
+        self.next_suffix = {}
+        self.claimed = set()
+        self.replaced = set()
+
+    def names_in(self, folder):
+        names = self.names.get(folder)
+        if names is None:
+            try:
+                names = {os.path.normcase(name) for name in os.listdir(folder)}
+            except FileNotFoundError:
+                names = set()
+            self.names[folder] = names
+        return names
+
+    def resolve(self, source, destination):
+        """Final destination path for a move, or raise ConflictSkipped"""
+        folder, name = os.path.split(destination)
+        names = self.names_in(folder)
+        key = os.path.normcase(name)
+        if key not in names:
+            names.add(key)
+            self.claimed.add((folder, key))
+            return destination
+
+        if self.policy == "skip":
+            raise ConflictSkipped(f"{destination} already exists")
+        if (folder, key) not in self.claimed:
+            if self.policy == "overwrite":
+                self.claimed.add((folder, key))
+                self.replaced.add(destination)
+                return destination
+            if self.policy == "newer":
+                if os.stat(source).st_mtime > os.stat(destination).st_mtime:
+                    self.claimed.add((folder, key))
+                    self.replaced.add(destination)
+                    return destination
+                raise ConflictSkipped(f"{destination} is not older than {source}")
+
+        stem, ext = os.path.splitext(name)
+        n = self.next_suffix.get((folder, key), 1)
+        while True:
+            candidate = f"{stem} ({n}){ext}"
+            candidate_key = os.path.normcase(candidate)
+            n += 1
+            if candidate_key not in names:
+                break
+        self.next_suffix[(folder, key)] = n
+        names.add(candidate_key)
+        self.claimed.add((folder, candidate_key))
+        return os.path.join(folder, candidate)
@@ -0,0 +1,106 @@
+import json
+import os
+from collections import Counter
+
+from .engine import Move
+
+
+def device_of(folder):
+    """Device a folder lives on, or will live on once it is created"""
+    while True:
+        try:
+            return os.stat(folder).st_dev
+        except FileNotFoundError:
+            parent = os.path.dirname(folder)
+            if parent == folder:
+                raise
+            folder = parent or "."
+
+
+class PlanSummary:
+    """Counts and bytes per category for a planned sort, plus predicted cross-device copies"""
+
+    def __init__(self):
+        self.files = Counter()
+        self.bytes = Counter()
+        self.cross_device = 0
+        self.cross_device_bytes = 0
+        self.dir_devices = {}
+
+    def add(self, move):
+        st = os.stat(move.source)
+        self.files[move.category] += 1
+        self.bytes[move.category] += st.st_size
+
+        dest_dir = os.path.dirname(move.destination)
+        device = self.dir_devices.get(dest_dir)
+        if device is None:
+            device = self.dir_devices[dest_dir] = device_of(dest_dir)
+        if device != st.st_dev:
+            self.cross_device += 1
+            self.cross_device_bytes += st.st_size
+
+    @property
+    def total_files(self):
+        return sum(self.files.values())
+
+    @property
+    def total_bytes(self):
+        return sum(self.bytes.values())
+
+    def as_dict(self):
+        return {
+            "files": dict(self.files),
+            "bytes": dict(self.bytes),
+            "total_files": self.total_files,
+            "total_bytes": self.total_bytes,
+            "cross_device": self.cross_device,
+            "cross_device_bytes": self.cross_device_bytes,
+        }
+
+    def format(self):
+        lines = [f"{category:<12} {count:>8} files {self.bytes[category]:>16,} bytes"
+                 for category, count in sorted(self.files.items())]
+        lines.append(f"{'Total':<12} {self.total_files:>8} files {self.total_bytes:>16,} bytes")
+        lines.append(f"Cross-device copies: {self.cross_device} ({self.cross_device_bytes:,} bytes)")
+        return "\n".join(lines)
+
+
+def dry_run(moves):
+    """Compute a full plan in memory without touching the filesystem
+
+    Returns the list of moves, which can later be passed to execute_plan
+    without rescanning, and its PlanSummary.
+    """
+    summary = PlanSummary()
+    plan = []
+    for move in moves:
+        try:
+            summary.add(move)
+        except OSError as e:
+            print(f"Error planning {os.path.basename(move.source)}: {e}")
+            continue
+        plan.append(move)
+    return plan, summary
+
+
+def write_plan(moves, path):
+    """Stream a plan to a JSON-lines file and return its PlanSummary"""
+    summary = PlanSummary()
+    with open(path, "w", encoding="utf-8") as f:
+        for move in moves:
+            try:
+                summary.add(move)
+            except OSError as e:
+                print(f"Error planning {os.path.basename(move.source)}: {e}")
+                continue
+            f.write(json.dumps(move._asdict()) + "\n")
+    return summary
+
+
+def read_plan(path):
+    """Yield the moves of a plan written by write_plan"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield Move(**json.loads(line))
@@ -0,0 +1,81 @@
+import os
+import time
+
+from .engine import Move, SortResult, execute_moves, remove_empty_dirs, session_folders, undo_operations
+from .executor import MoveExecutor
+
+
+def recover_session(store, session_id):
+    """Reconcile an interrupted session's intents with the filesystem
+
+    Intents whose file already reached its destination are journaled, so
+    they can be undone like any other move. A copy that was cut short
+    (source still there, destination present and no larger) is removed,
+    but only when the destination name was free when the intent was
+    written; a file the move was going to overwrite is left alone.
+    Returns the moves that still have to happen and leaves the session
+    open.
+    """
+    store.reopen_session(session_id)
+    remaining = []
+    for source, destination, category, action, origin, existed in store.pending_intents(session_id):
+        move = Move(source, destination, category, action, origin)
+        if not os.path.lexists(source):
+            if os.path.lexists(destination):
+                store.log_operation(source, destination, action)
+            continue
+        if os.path.lexists(destination) and not existed:
+            try:
+                if os.path.getsize(destination) <= os.path.getsize(source):
+                    os.remove(destination)
+            except OSError as e:
+                print(f"Error cleaning up {destination}: {e}")
+        remaining.append(move)
+    store.flush()
+    store.clear_intents(session_id)
+    return remaining
+
+
+def finish_session(store, session_id, moves, workers=1, conflict="rename", metrics=None, progress=None,
+                   cancel=None):
+    """Run the moves recover_session left over in its reopened session and close it"""
+    start_time = time.time()
+    moved = errors = skipped = 0
+    interrupted = True
+    try:
+        executor = MoveExecutor(workers, conflict=conflict, metrics=metrics)
+        moved, errors, skipped = execute_moves(moves, store, executor, progress, cancel, metrics)
+        interrupted = False
+    finally:
+        cancelled = cancel is not None and cancel.is_set()
+        result = SortResult(moved, errors, time.time() - start_time, cancelled, skipped)
+        if metrics is not None:
+            metrics.enter("journal")
+        store.end_session(result, interrupted)
+        if metrics is not None:
+            metrics.finish("resume", result, session_id)
+    return result
+
+
+def resume_session(store, session_id, workers=1, conflict="rename", metrics=None):
+    """Finish an interrupted session's outstanding moves"""
+    return finish_session(store, session_id, recover_session(store, session_id), workers, conflict, metrics)
+
+
+def rollback_operations(store, session_id):
+    """Close an interrupted session and return its operations, ready for undo_operations
+
+    A session that moved nothing has nothing to undo, so the folders it
+    created are removed here.
+    """
+    recover_session(store, session_id)
+    store.end_session()
+    operations = store.get_session_operations(session_id)
+    if not operations:
+        remove_empty_dirs(session_folders(store, session_id))
+    return operations
+
+
+def rollback_session(store, session_id, workers=1, metrics=None):
+    """Undo everything an interrupted session did"""
+    return undo_operations(rollback_operations(store, session_id), store, workers, metrics)
@@ -0,0 +1,242 @@
+import fnmatch
+import json
+import os
+import re
+import string
+import time
+
+from .categories import FILE_CATEGORIES
+from .classify import classify_record
+
+# The behaviour of the plain category sort, expressed as a rule
+DEFAULT_RULE = {"destination": "{category}"}
+
+SIZE_UNITS = {"": 1, "b": 1, "kb": 1 << 10, "mb": 1 << 20, "gb": 1 << 30, "tb": 1 << 40}
+DATE_FIELDS = {"year", "month", "day"}
+TEMPLATE_FIELDS = DATE_FIELDS | {"category", "ext", "name"}
+FIELD_PATTERNS = {"year": r"\d{4}", "month": r"\d{2}", "day": r"\d{2}",
+                  "category": "|".join(re.escape(category) for category in FILE_CATEGORIES)}
+NAMED_GROUP = re.compile(r"\(\?P([<=])(\w+)([>)])")
+
+
+class RuleError(ValueError):
+    """Raised for a rules file that cannot be compiled"""
+
+
+def parse_size(value):
+    """Bytes from an int or a string such as '1 GB' or '500kb'"""
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = re.fullmatch(r"\s*([\d.]+)\s*([a-zA-Z]*)\s*", str(value))
+    if not match or match.group(2).lower() not in SIZE_UNITS:
+        raise RuleError(f"Bad size: {value!r}")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).lower()])
+
+
+def _prefix_groups(source, prefix):
+    """Rename a regex's named groups (and their back-references) so that
+    several regexes can share one alternation without clashing"""
+    return NAMED_GROUP.sub(lambda m: f"(?P{m[1]}{prefix}{m[2]}{m[3]}", source)
+
+
+def _compile(source, what):
+    try:
+        return re.compile(source, re.IGNORECASE)
+    except re.error as e:
+        raise RuleError(f"Bad {what} {source!r}: {e}") from None
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    return [value] if isinstance(value, str) else list(value)
+
+
+class Rule:
+    """One compiled rule. Predicates are tried cheapest first: in-memory
+    checks on the name, then anything that needs a stat, and the category
+    (which may sniff the file's content) last."""
+
+    def __init__(self, spec):
+        unknown = set(spec) - {"name", "extensions", "categories", "pattern", "regex",
+                               "min_size", "max_size", "older_than_days", "newer_than_days",
+                               "destination"}
+        if unknown:
+            raise RuleError(f"Unknown rule keys: {', '.join(sorted(unknown))}")
+        if "destination" not in spec:
+            raise RuleError(f"Rule without a destination: {spec!r}")
+
+        self.name = spec.get("name")
+        self.extensions = {ext.lower() for ext in _as_list(spec.get("extensions"))}
+        self.categories = set(_as_list(spec.get("categories")))
+        patterns = [fnmatch.translate(p) for p in _as_list(spec.get("pattern"))]
+        for regex in _as_list(spec.get("regex")):
+            _compile(regex, "regex")
+            patterns.append(f"(?:{regex})\\Z")
+        self.pattern_source = "|".join(f"(?:{_prefix_groups(p, f'p{i}_')})"
+                                       for i, p in enumerate(patterns)) or None
+        self.pattern = _compile(self.pattern_source, "pattern") if self.pattern_source else None
+        self.min_size = parse_size(spec["min_size"]) if "min_size" in spec else None
+        self.max_size = parse_size(spec["max_size"]) if "max_size" in spec else None
+        self.older_than = float(spec["older_than_days"]) * 86400 if "older_than_days" in spec else None
+        self.newer_than = float(spec["newer_than_days"]) * 86400 if "newer_than_days" in spec else None
+
+        self.destination = spec["destination"]
+        fields = {field for _, field, _, _ in string.Formatter().parse(self.destination) if field}
+        if fields - TEMPLATE_FIELDS:
+            raise RuleError(f"Unknown destination fields: {', '.join(sorted(fields - TEMPLATE_FIELDS))}")
+        self.fields = fields
+
+    def matches(self, record, category, now):
+        """Everything but the extension, which RuleSet has already checked"""
+        if self.pattern is not None and not self.pattern.match(record.name):
+            return False
+        if self.min_size is not None and record.size < self.min_size:
+            return False
+        if self.max_size is not None and record.size > self.max_size:
+            return False
+        if self.older_than is not None and now - record.mtime < self.older_than:
+            return False
+        if self.newer_than is not None and now - record.mtime > self.newer_than:
+            return False
+        if self.categories and category() not in self.categories:
+            return False
+        return True
+
+    def render(self, record, category):
+        values = {}
+        if "category" in self.fields:
+            values["category"] = category()
+        if "ext" in self.fields:
+            values["ext"] = record.ext.lstrip(".") or "none"
+        if "name" in self.fields:
+            values["name"] = self.name or ""
+        if self.fields & DATE_FIELDS:
+            t = time.localtime(record.mtime)
+            values.update(year=f"{t.tm_year:04d}", month=f"{t.tm_mon:02d}", day=f"{t.tm_mday:02d}")
+        return os.path.normpath(self.destination.format(**values))
+
+    def head_pattern(self):
+        """Regex for the folder names the destination's first part can render to,
+        or None when that part is plain text"""
+        head = self.destination.replace("\\", "/").split("/", 1)[0]
+        if "{" not in head:
+            return None
+        parts = []
+        for literal, field, _, _ in string.Formatter().parse(head):
+            parts.append(re.escape(literal))
+            if field == "ext":
+                exts = {ext.rsplit(".", 1)[-1] for ext in self.extensions}
+                parts.append(f"(?:{'|'.join(map(re.escape, sorted(exts)))})" if exts else r"[^/\\]+")
+            elif field == "name":
+                parts.append(re.escape(self.name or ""))
+            elif field:
+                parts.append(f"(?:{FIELD_PATTERNS[field]})")
+        return "".join(parts)
+
+
+class RuleSet:
+    """Rules compiled into a matcher; the first matching rule wins
+
+    Extension conditions become one dict lookup that yields the candidate
+    rules for a file, and every name pattern is folded into one regex so
+    files matching none of them skip all pattern rules at once.
+    """
+
+    def __init__(self, specs, sniff=True, fallback=True):
+        specs = list(specs)
+        if fallback:
+            specs.append(DEFAULT_RULE)
+        self.rules = [Rule(spec) for spec in specs]
+        self.sniff = sniff
+
+        generic = [i for i, rule in enumerate(self.rules) if not rule.extensions]
+        by_ext = {}
+        for i, rule in enumerate(self.rules):
+            for ext in rule.extensions:
+                by_ext.setdefault(ext, []).append(i)
+        self.candidates = {ext: sorted(set(indexes + generic)) for ext, indexes in by_ext.items()}
+        self.generic = generic
+        self.max_ext_parts = max((ext.count(".") for ext in by_ext), default=0)
+
+        sources = [f"(?:{_prefix_groups(rule.pattern_source, f'r{i}_')})"
+                   for i, rule in enumerate(self.rules) if rule.pattern_source]
+        self.any_pattern = _compile("|".join(sources), "pattern") if sources else None
+
+    @classmethod
+    def load(cls, path, sniff=True):
+        """Compile a .toml or .json rules file"""
+        if path.endswith(".toml"):
+            import tomllib
+            with open(path, "rb") as f:
+                data = tomllib.load(f)
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        if isinstance(data, list):
+            data = {"rule": data}
+        return cls(data.get("rule", data.get("rules", [])), sniff=sniff,
+                   fallback=data.get("fallback", True))
+
+    def candidate_rules(self, name):
+        """Rule indexes worth trying for a file name, in rule order
+
+        A name with several known extensions (x.tar.gz is both .gz and
+        .tar.gz) gets the rules of all of them.
+        """
+        lowered = name.lower()
+        pos = len(lowered)
+        found = []
+        for _ in range(self.max_ext_parts):
+            pos = lowered.rfind(".", 0, pos)
+            if pos < 0:
+                break
+            candidates = self.candidates.get(lowered[pos:])
+            if candidates is not None:
+                found.append(candidates)
+        if not found:
+            return self.generic
+        if len(found) == 1:
+            return found[0]
+        return sorted(set().union(*found))
+
+    def match(self, record, now=None):
+        """(label, destination relative to the output folder) for a file, or None
+
+        None too for a file that vanished since it was listed (its size and
+        dates are read lazily), so a busy drop folder does not stop the sort.
+        """
+        try:
+            return self.match_rules(record, time.time() if now is None else now)
+        except OSError:
+            return None
+
+    def match_rules(self, record, now):
+        cached = []
+
+        def category():
+            if not cached:
+                cached.append(classify_record(record, self.sniff))
+            return cached[0]
+
+        named_pattern = self.any_pattern is not None and self.any_pattern.match(record.name)
+        for i in self.candidate_rules(record.name):
+            rule = self.rules[i]
+            if rule.pattern is not None and not named_pattern:
+                continue
+            if rule.matches(record, category, now):
+                return rule.name or category(), rule.render(record, category)
+        return None
+
+    def output_roots(self):
+        """Top-level folders the rules can write into, so a recursive walk can skip them"""
+        roots = set()
+        for rule in self.rules:
+            head = rule.destination.replace("\\", "/").split("/", 1)[0]
+            if "{" not in head:
+                roots.add(head)
+        return roots
+
+    def output_patterns(self):
+        """Regexes for the top-level folders of templated destinations such as {year}/{month}"""
+        return [pattern for pattern in (rule.head_pattern() for rule in self.rules) if pattern is not None]
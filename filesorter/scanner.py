@@ -0,0 +1,131 @@
+import fnmatch
+import os
+import re
+from collections import deque, namedtuple
+from itertools import islice
+
+SYMLINK_POLICIES = ("skip", "files", "follow")
+
+# How far and where a recursive scan may go. max_depth 0 is the top level
+# only; symlinks is "skip" (ignore links), "files" (take linked files but
+# never descend through linked folders) or "follow" (descend, once per folder)
+WalkOptions = namedtuple("WalkOptions", ["max_depth", "exclude", "symlinks"],
+                         defaults=(None, (), "files"))
+
+
+class FileRecord:
+    """A file found while scanning, backed by its cached os.DirEntry
+
+    The file type comes from the directory listing itself, and size/mtime
+    are only stat'ed (once) when something asks for them.
+    """
+
+    __slots__ = ("entry",)
+
+    def __init__(self, entry):
+        self.entry = entry
+
+    @property
+    def name(self):
+        return self.entry.name
+
+    @property
+    def path(self):
+        return self.entry.path
+
+    @property
+    def ext(self):
+        return os.path.splitext(self.entry.name)[1].lower()
+
+    @property
+    def size(self):
+        return self.entry.stat().st_size
+
+    @property
+    def mtime(self):
+        return self.entry.stat().st_mtime
+
+    def __repr__(self):
+        return f"FileRecord({self.entry.path!r})"
+
+
+def scan_files(folder):
+    """Yield a FileRecord for every regular file directly inside a folder"""
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            try:
+                if entry.is_file():
+                    yield FileRecord(entry)
+            except OSError:
+                continue  # Vanished or unreadable entry
+
+
+def compile_excludes(patterns):
+    """Combine glob patterns into a single regex, or None when there are none"""
+    if not patterns:
+        return None
+    return re.compile("|".join(fnmatch.translate(pattern) for pattern in patterns))
+
+
+def walk_files(root, options=None, skip_dirs=(), skip_pattern=None):
+    """Yield a FileRecord for every file under root as soon as it is found
+
+    Folders in skip_dirs (such as the category folders a sort writes to),
+    or whose normcased absolute path matches skip_pattern, are never
+    entered. Exclude globs are matched against both the entry name and
+    its path relative to root.
+    """
+    options = options or WalkOptions()
+    if options.symlinks not in SYMLINK_POLICIES:
+        raise ValueError(f"Unknown symlink policy: {options.symlinks}")
+    excluded = compile_excludes(options.exclude)
+    skip = {os.path.normcase(os.path.abspath(folder)) for folder in skip_dirs}
+    follow = options.symlinks == "follow"
+    visited = set()
+    if follow:
+        st = os.stat(root)
+        visited.add((st.st_dev, st.st_ino))
+
+    stack = [(root, 0, "")]
+    while stack:
+        folder, depth, rel = stack.pop()
+        subdirs = []
+        try:
+            entries = os.scandir(folder)
+        except OSError:
+            continue  # Unreadable folder
+        with entries:
+            for entry in entries:
+                rel_path = rel + entry.name
+                if excluded and (excluded.match(entry.name) or excluded.match(rel_path)):
+                    continue
+                try:
+                    if options.symlinks == "skip" and entry.is_symlink():
+                        continue
+                    if entry.is_dir(follow_symlinks=follow):
+                        if options.max_depth is not None and depth >= options.max_depth:
+                            continue
+                        path = os.path.normcase(os.path.abspath(entry.path))
+                        if path in skip or (skip_pattern is not None and skip_pattern.fullmatch(path)):
+                            continue
+                        if follow:
+                            st = entry.stat()
+                            if (st.st_dev, st.st_ino) in visited:
+                                continue
+                            visited.add((st.st_dev, st.st_ino))
+                        subdirs.append((entry.path, depth + 1, rel_path + "/"))
+                    elif entry.is_file():
+                        yield FileRecord(entry)
+                except OSError:
+                    continue  # Vanished or unreadable entry
+        stack.extend(reversed(subdirs))
+
+
+def first_n(records, n):
+    """The first n records, without reading the rest of the listing"""
+    return islice(records, n)
+
+
+def last_n(records, n):
+    """The last n records, holding at most n of them in memory"""
+    return deque(records, maxlen=n)
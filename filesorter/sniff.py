@@ -0,0 +1,102 @@
+import os
+import threading
+
+# Constants
+SNIFF_BYTES = 4096
+MEMO_LIMIT = 100_000
+
+# (offset, magic bytes, category), checked in order
+SIGNATURES = [
+    (0, b"%PDF-", "Documents"),
+    (0, b"{\\rtf", "Documents"),
+    (0, b"\x89PNG\r\n\x1a\n", "Images"),
+    (0, b"\xff\xd8\xff", "Images"),
+    (0, b"GIF87a", "Images"),
+    (0, b"GIF89a", "Images"),
+    (0, b"II*\x00", "Images"),
+    (0, b"MM\x00*", "Images"),
+    (8, b"WEBP", "Images"),
+    (4, b"ftypheic", "Images"),
+    (4, b"ftypheix", "Images"),
+    (4, b"ftypmif1", "Images"),
+    (8, b"AVI ", "Videos"),
+    (0, b"\x1a\x45\xdf\xa3", "Videos"),
+    (4, b"ftypqt", "Videos"),
+    (4, b"ftypM4A", "Music"),
+    (4, b"ftyp", "Videos"),
+    (0, b"\x00\x00\x01\xba", "Videos"),
+    (8, b"WAVE", "Music"),
+    (0, b"ID3", "Music"),
+    (0, b"fLaC", "Music"),
+    (0, b"OggS", "Music"),
+    (0, b"\xff\xfb", "Music"),
+    (0, b"\xff\xf3", "Music"),
+    (0, b"PK\x03\x04", "Archives"),
+    (0, b"PK\x05\x06", "Archives"),
+    (0, b"Rar!\x1a\x07", "Archives"),
+    (0, b"7z\xbc\xaf\x27\x1c", "Archives"),
+    (0, b"\x1f\x8b", "Archives"),
+    (0, b"BZh", "Archives"),
+    (0, b"\xfd7zXZ\x00", "Archives"),
+    (257, b"ustar", "Archives"),
+    (0, b"MZ", "Executables"),
+    (0, b"\x7fELF", "Executables"),
+    (0, b"\xcf\xfa\xed\xfe", "Executables"),
+    (0, b"#!", "Code"),
+    (0, b"SQLite format 3\x00", "Code"),
+]
+
+
+class Sniffer:
+    """Classify files by their leading bytes when the extension says nothing
+
+    Each file costs one open and one read of at most SNIFF_BYTES into a
+    buffer reused by the calling thread. Results are memoised per
+    (device, inode, mtime) so a file is only read again after it changes.
+    """
+
+    def __init__(self, signatures=SIGNATURES):
+        self.signatures = signatures
+        self.read_size = min(SNIFF_BYTES, max(offset + len(magic) for offset, magic, _ in signatures))
+        self.local = threading.local()
+        self.memo = {}
+
+    def buffer(self):
+        view = getattr(self.local, "view", None)
+        if view is None:
+            view = self.local.view = memoryview(bytearray(self.read_size))
+        return view
+
+    def match(self, head):
+        for offset, magic, category in self.signatures:
+            if head[offset:offset + len(magic)] == magic:
+                return category
+        return None
+
+    def sniff(self, path, st=None):
+        """Category guessed from a file's content, or None"""
+        try:
+            st = st or os.stat(path)
+            # DirEntry.stat() on Windows leaves st_ino at 0, so fall back to the path
+            key = (st.st_dev, st.st_ino or path, st.st_mtime_ns)
+            if key in self.memo:
+                return self.memo[key]
+            view = self.buffer()
+            with open(path, "rb", buffering=0) as f:
+                n = f.readinto(view)
+            category = self.match(view[:n])
+        except OSError:
+            return None
+        if len(self.memo) >= MEMO_LIMIT:
+            self.memo.clear()
+        self.memo[key] = category
+        return category
+
+    def sniff_record(self, record):
+        try:
+            return self.sniff(record.path, record.entry.stat())
+        except OSError:
+            return None
+
+
+SNIFFER = Sniffer()
@@ -0,0 +1,328 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from .journal import FLUSH_EVERY, LOG_FILE
+
+# Constants
+DB_FILE = "sorting_log.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    started TEXT NOT NULL,
+    finished TEXT,
+    moved INTEGER NOT NULL DEFAULT 0,
+    errors INTEGER NOT NULL DEFAULT 0,
+    time_taken REAL,
+    undone INTEGER NOT NULL DEFAULT 0,
+    label TEXT
+);
+CREATE TABLE IF NOT EXISTS moves (
+    id INTEGER PRIMARY KEY,
+    session_seq INTEGER NOT NULL REFERENCES sessions(seq),
+    timestamp TEXT NOT NULL,
+    source TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    action TEXT NOT NULL DEFAULT 'move'
+);
+CREATE INDEX IF NOT EXISTS moves_by_session ON moves(session_seq, id);
+CREATE TABLE IF NOT EXISTS intents (
+    id INTEGER PRIMARY KEY,
+    session_seq INTEGER NOT NULL REFERENCES sessions(seq),
+    source TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    category TEXT,
+    action TEXT NOT NULL DEFAULT 'move',
+    origin TEXT,
+    existed INTEGER NOT NULL DEFAULT 0,
+    done INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS intents_by_session ON intents(session_seq, done);
+CREATE TABLE IF NOT EXISTS created_dirs (
+    id INTEGER PRIMARY KEY,
+    session_seq INTEGER NOT NULL REFERENCES sessions(seq),
+    path TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS created_dirs_by_session ON created_dirs(session_seq);
+"""
+
+
+class SessionStore:
+    """Indexed SQLite store of sort sessions, used in place of the text journal
+
+    While a session runs, every batch of moves is written as intents
+    before it is executed, and intents are marked done in the same
+    transaction that journals their moves. A session that still has
+    intents after a crash can be resumed or rolled back (see recovery).
+    Folders a session creates are recorded before they are made, so undo
+    removes those and never one that was there before.
+    """
+
+    def __init__(self, path=DB_FILE, legacy_log=LOG_FILE):
+        self.path = path
+        self.current_session_id = None
+        self.current_seq = None
+        self.pending = []
+        self.pending_done = []
+        self.intent_ids = {}
+        self.lock = threading.Lock()
+
+        first_run = not os.path.exists(path)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.executescript(SCHEMA)
+        self.upgrade_schema()
+
+        if first_run and legacy_log and os.path.exists(legacy_log):
+            self.import_log(legacy_log)
+
+    def upgrade_schema(self):
+        """Add columns introduced after a store was first created"""
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(moves)")}
+        if "action" not in columns:
+            with self.conn:
+                self.conn.execute("ALTER TABLE moves ADD COLUMN action TEXT NOT NULL DEFAULT 'move'")
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(intents)")}
+        if "existed" not in columns:
+            with self.conn:
+                self.conn.execute("ALTER TABLE intents ADD COLUMN existed INTEGER NOT NULL DEFAULT 0")
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(sessions)")}
+        if "label" not in columns:
+            with self.conn:
+                self.conn.execute("ALTER TABLE sessions ADD COLUMN label TEXT")
+
+    def close(self):
+        self.end_session()
+        self.conn.close()
+
+    def start_session(self, label=None):
+        """Open a new session row for a sorting operation, optionally named by label (a batch job)"""
+        self.end_session()
+        self.current_session_id = str(uuid.uuid4())
+        with self.lock, self.conn:
+            cur = self.conn.execute("INSERT INTO sessions (id, started, label) VALUES (?, ?, ?)",
+                                    (self.current_session_id, time.strftime("%Y-%m-%d %H:%M:%S"), label))
+        self.current_seq = cur.lastrowid
+        return self.current_session_id
+
+    def reopen_session(self, session_id):
+        """Continue logging into an existing (interrupted) session"""
+        self.end_session()
+        with self.lock:
+            row = self.conn.execute("SELECT seq FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        if row is None:
+            raise KeyError(session_id)
+        self.current_session_id = session_id
+        self.current_seq = row[0]
+
+    def end_session(self, result=None, interrupted=False):
+        """Commit outstanding moves, drop the session's intents and record its stats
+
+        A session interrupted by an error keeps the intents that are not
+        done, so it shows up in interrupted_sessions and can be recovered.
+        """
+        if self.current_session_id is None:
+            return
+        self.flush()
+        with self.lock, self.conn:
+            if interrupted:
+                self.conn.execute("DELETE FROM intents WHERE session_seq = ? AND done = 1", (self.current_seq,))
+            else:
+                self.conn.execute("DELETE FROM intents WHERE session_seq = ?", (self.current_seq,))
+            if result is not None:
+                self.conn.execute(
+                    "UPDATE sessions SET finished = ?, moved = (SELECT COUNT(*) FROM moves WHERE session_seq = ?), "
+                    "errors = ?, time_taken = ? WHERE seq = ?",
+                    (time.strftime("%Y-%m-%d %H:%M:%S"), self.current_seq, result.errors,
+                     result.time_taken, self.current_seq))
+            else:
+                self.conn.execute("UPDATE sessions SET finished = ? WHERE seq = ?",
+                                  (time.strftime("%Y-%m-%d %H:%M:%S"), self.current_seq))
+        self.current_session_id = None
+        self.current_seq = None
+        self.intent_ids = {}
+
+    def write_intents(self, moves, replaced=()):
+        """Record a batch of resolved moves as intents before they run
+
+        replaced holds the destinations that overwrite a file already
+        there, so recovery knows not to treat that file as a partial copy.
+        """
+        if not moves:
+            return
+        with self.lock, self.conn:
+            for move in moves:
+                cur = self.conn.execute(
+                    "INSERT INTO intents (session_seq, source, destination, category, action, origin, existed) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (self.current_seq, move.source, move.destination, move.category, move.action, move.origin,
+                     move.destination in replaced))
+                self.intent_ids[move.source] = cur.lastrowid
+
+    def log_dirs(self, paths):
+        """Record folders the current session is about to create"""
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT INTO created_dirs (session_seq, path) VALUES (?, ?)",
+                                  [(self.current_seq, path) for path in paths])
+
+    def session_dirs(self, session_id):
+        """Folders a session created"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT d.path FROM created_dirs d JOIN sessions s ON s.seq = d.session_seq "
+                "WHERE s.id = ?", (session_id,)).fetchall()
+        return [path for path, in rows]
+
+    def log_operation(self, source, destination, action="move"):
+        """Buffer a file move operation for the current session"""
+        self.pending.append((self.current_seq, time.strftime("%Y-%m-%d %H:%M:%S"),
+                             source, destination, action))
+        intent_id = self.intent_ids.pop(source, None)
+        if intent_id is not None:
+            self.pending_done.append((intent_id,))
+        if len(self.pending) >= FLUSH_EVERY:
+            self.flush()
+
+    def flush(self):
+        """Write buffered operations, and mark their intents done, in a single transaction"""
+        if not self.pending:
+            return
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO moves (session_seq, timestamp, source, destination, action) VALUES (?, ?, ?, ?, ?)",
+                self.pending)
+            self.conn.executemany("UPDATE intents SET done = 1 WHERE id = ?", self.pending_done)
+        self.pending = []
+        self.pending_done = []
+
+    def interrupted_sessions(self):
+        """Sessions that stopped with intents still outstanding"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT s.id, s.started, SUM(i.done = 0) FROM sessions s JOIN intents i ON i.session_seq = s.seq "
+                "WHERE s.id IS NOT ? GROUP BY s.seq HAVING SUM(i.done = 0) > 0 ORDER BY s.seq",
+                (self.current_session_id,)).fetchall()
+        return [{"id": session_id, "started": started, "pending": pending}
+                for session_id, started, pending in rows]
+
+    def pending_intents(self, session_id):
+        """(source, destination, category, action, origin, existed) of every intent not yet done"""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT i.source, i.destination, i.category, i.action, i.origin, i.existed FROM intents i "
+                "JOIN sessions s ON s.seq = i.session_seq "
+                "WHERE s.id = ? AND i.done = 0 ORDER BY i.id", (session_id,)).fetchall()
+
+    def clear_intents(self, session_id):
+        """Forget a session's outstanding intents"""
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM intents WHERE session_seq = (SELECT seq FROM sessions WHERE id = ?)",
+                              (session_id,))
+
+    def get_session_operations(self, session_id):
+        """All operations of a session, most recent first"""
+        self.flush()
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT m.id, m.timestamp, s.id, m.source, m.destination, m.action FROM moves m "
+                "JOIN sessions s ON s.seq = m.session_seq "
+                "WHERE s.id = ? ORDER BY m.id DESC", (session_id,)).fetchall()
+        return [{"id": move_id, "timestamp": timestamp, "session": session, "source": source,
+                 "destination": destination, "action": action}
+                for move_id, timestamp, session, source, destination, action in rows]
+
+    def last_session_id(self, label=None):
+        """The most recent session that can still be undone, optionally only among those with a label"""
+        self.flush()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT s.id FROM sessions s WHERE s.undone = 0 AND (? IS NULL OR s.label = ?) "
+                "AND EXISTS (SELECT 1 FROM moves m WHERE m.session_seq = s.seq) "
+                "ORDER BY s.seq DESC LIMIT 1", (label, label)).fetchone()
+        return row[0] if row else None
+
+    def get_last_session_operations(self):
+        """Get all operations from the most recent session that can still be undone"""
+        session_id = self.last_session_id()
+        if session_id is None:
+            return []
+        return self.get_session_operations(session_id)
+
+    def list_sessions(self, limit=20):
+        """Recent sessions with their stats, newest first"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, started, finished, moved, errors, time_taken, undone, label FROM sessions "
+                "ORDER BY seq DESC LIMIT ?", (limit,)).fetchall()
+        keys = ("id", "started", "finished", "moved", "errors", "time_taken", "undone", "label")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def remove_session(self, session_id):
+        """Mark a session undone and drop its moves"""
+        self.flush()
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM moves WHERE session_seq = (SELECT seq FROM sessions WHERE id = ?)",
+                              (session_id,))
+            self.conn.execute("DELETE FROM intents WHERE session_seq = (SELECT seq FROM sessions WHERE id = ?)",
+                              (session_id,))
+            self.conn.execute("DELETE FROM created_dirs WHERE session_seq = (SELECT seq FROM sessions WHERE id = ?)",
+                              (session_id,))
+            self.conn.execute("UPDATE sessions SET undone = 1 WHERE id = ?", (session_id,))
+
+    def remove_operations(self, session_id, operations):
+        """Drop the given moves of a session, leaving the rest to be undone later"""
+        self.flush()
+        with self.lock, self.conn:
+            self.conn.executemany("DELETE FROM moves WHERE id = ?", [(op["id"],) for op in operations])
+
+    def import_log(self, log_path):
+        """Load the sessions of a sorting_log.txt written by the text journal"""
+        sessions = {}
+        moves = []
+        with open(log_path, "r") as f:
+            for line in f:
+                parts = line.rstrip("\n").split("|", 2)
+                if len(parts) < 3 or "|" not in parts[2]:
+                    continue
+                timestamp, session_id, paths = parts
+                if session_id not in sessions:
+                    sessions[session_id] = timestamp
+                source, destination = split_logged_paths(paths)
+                moves.append((session_id, timestamp, source, destination))
+
+        with self.lock, self.conn:
+            seqs = {}
+            for session_id, started in sessions.items():
+                cur = self.conn.execute(
+                    "INSERT OR IGNORE INTO sessions (id, started, finished) VALUES (?, ?, ?)",
+                    (session_id, started, started))
+                seqs[session_id] = cur.lastrowid
+            self.conn.executemany(
+                "INSERT INTO moves (session_seq, timestamp, source, destination) VALUES (?, ?, ?, ?)",
+                [(seqs[session_id], timestamp, source, destination)
+                 for session_id, timestamp, source, destination in moves])
+            self.conn.executemany(
+                "UPDATE sessions SET moved = (SELECT COUNT(*) FROM moves WHERE session_seq = ?) WHERE seq = ?",
+                [(seq, seq) for seq in seqs.values()])
+        return len(moves)
+
+
+def split_logged_paths(paths):
+    """Split 'source|destination' from the text log, even when paths contain '|'
+
+    Sorting keeps the file name, so the right split is the one where the
+    destination ends with the source's file name.
+    """
+    pos = paths.find("|")
+    first = pos
+    while pos >= 0:
+        source, destination = paths[:pos], paths[pos + 1:]
+        if os.path.basename(source) == os.path.basename(destination):
+            return source, destination
+        pos = paths.find("|", pos + 1)
+    return paths[:first], paths[first + 1:]
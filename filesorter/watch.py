@@ -0,0 +1,229 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+from .categories import FILE_CATEGORIES
+from .classify import classify_path
+from .engine import Move, SortResult, execute_moves
+from .executor import MoveExecutor
+from .scanner import compile_excludes
+
+# Constants
+SETTLE_SECONDS = 2.0     # a file must stay unchanged this long before it is sorted
+POLL_INTERVAL = 2.0      # seconds between directory checks without inotify
+IDLE_WAIT = 1.0          # longest sleep, so a stop request is noticed promptly
+DEFAULT_IGNORE = ("*.part", "*.crdownload", "*.tmp", "*.download", ".~*", "~$*")
+
+# inotify(7) flags
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class InotifyBackend:
+    """Names of files in a folder that were closed after writing or moved in"""
+
+    def __init__(self, folder):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(folder), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, f"Cannot watch {folder}")
+
+    def wait(self, timeout):
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 64 << 10)
+        except BlockingIOError:
+            return []
+        names = []
+        pos = 0
+        while pos < len(data):
+            _, mask, _, length = EVENT_HEADER.unpack_from(data, pos)
+            pos += EVENT_HEADER.size
+            name = data[pos:pos + length].rstrip(b"\0")
+            pos += length
+            if name and not mask & IN_ISDIR:
+                names.append(os.fsdecode(name))
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollBackend:
+    """Snapshot-diff fallback: only lists the folder when its mtime moves"""
+
+    def __init__(self, folder, interval=POLL_INTERVAL, stop=None):
+        self.folder = folder
+        self.interval = interval
+        self.stop = stop or threading.Event()
+        self.dir_mtime = None
+        self.snapshot = {}
+        self.next_poll = 0
+        self.scan()
+
+    def scan(self):
+        """Re-list the folder, returning names that are new or changed"""
+        changed = []
+        snapshot = {}
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                try:
+                    if not entry.is_file():
+                        continue
+                    st = entry.stat()
+                except OSError:
+                    continue
+                signature = (st.st_size, st.st_mtime_ns)
+                snapshot[entry.name] = signature
+                if self.snapshot.get(entry.name) != signature:
+                    changed.append(entry.name)
+        self.snapshot = snapshot
+        return changed
+
+    def wait(self, timeout):
+        delay = min(timeout, max(0, self.next_poll - time.monotonic()))
+        if delay > 0 and self.stop.wait(delay):
+            return []
+        if time.monotonic() < self.next_poll:
+            return []
+        self.next_poll = time.monotonic() + self.interval
+
+        st = os.stat(self.folder)
+        # Coarse directory timestamps can hide a change made within the same tick
+        recent = time.time() - st.st_mtime < self.interval
+        if st.st_mtime_ns == self.dir_mtime and not recent:
+            return []
+        self.dir_mtime = st.st_mtime_ns
+        return self.scan()
+
+    def close(self):
+        pass
+
+
+class Watcher:
+    """Sort files into category folders as they arrive in a folder
+
+    New files are sorted once they have stayed unchanged for the settle
+    time. Each batch is committed to the journal as it is moved, and the
+    whole run is a single session, so it can be undone as one. metrics,
+    a Metrics, gets one report for the whole run when it stops.
+    """
+
+    def __init__(self, source_folder, journal, dest_folder=None, selected_categories=None,
+                 sniff=True, workers=1, conflict="rename", settle=SETTLE_SECONDS,
+                 poll_interval=POLL_INTERVAL, ignore=DEFAULT_IGNORE, use_inotify=None, metrics=None):
+        self.source_folder = source_folder
+        self.dest_folder = dest_folder or source_folder
+        self.journal = journal
+        self.selected_categories = selected_categories or list(FILE_CATEGORIES)
+        self.sniff = sniff
+        self.workers = workers
+        self.conflict = conflict
+        self.settle = settle
+        self.poll_interval = poll_interval
+        self.ignored = compile_excludes(ignore)
+        if use_inotify is None:
+            use_inotify = sys.platform.startswith("linux")
+        self.use_inotify = use_inotify
+        self.metrics = metrics
+        self.pending = {}
+
+    def make_backend(self, stop):
+        if self.use_inotify:
+            try:
+                return InotifyBackend(self.source_folder)
+            except OSError as e:
+                print(f"inotify unavailable ({e}), polling instead")
+        return PollBackend(self.source_folder, self.poll_interval, stop)
+
+    def signature(self, name):
+        try:
+            st = os.stat(os.path.join(self.source_folder, name))
+        except OSError:
+            return None
+        return (st.st_size, st.st_mtime_ns)
+
+    def settled_names(self, now):
+        """Names whose settle time ran out without the file changing"""
+        ready = []
+        for name, (deadline, signature) in list(self.pending.items()):
+            if deadline > now:
+                continue
+            current = self.signature(name)
+            if current is None:
+                del self.pending[name]
+            elif current == signature:
+                del self.pending[name]
+                ready.append(name)
+            else:
+                self.pending[name] = (now + self.settle, current)
+        return ready
+
+    def plan(self, names):
+        for name in names:
+            source = os.path.join(self.source_folder, name)
+            category = classify_path(source, self.sniff)
+            if category in self.selected_categories:
+                yield Move(source, os.path.join(self.dest_folder, category, name), category)
+
+    def run(self, stop=None, on_batch=None):
+        """Watch until the stop event is set; returns the totals as a SortResult"""
+        stop = stop or threading.Event()
+        backend = self.make_backend(stop)
+        session_id = self.journal.start_session()
+        start_time = time.time()
+        moved = errors = skipped = 0
+        interrupted = True
+
+        try:
+            while not stop.is_set():
+                now = time.monotonic()
+                if self.pending:
+                    timeout = max(0, min(deadline for deadline, _ in self.pending.values()) - now)
+                    timeout = min(timeout, IDLE_WAIT)
+                else:
+                    timeout = IDLE_WAIT
+
+                for name in backend.wait(timeout):
+                    if self.ignored and self.ignored.match(name):
+                        continue
+                    signature = self.signature(name)
+                    if signature is not None:
+                        self.pending[name] = (time.monotonic() + self.settle, signature)
+
+                ready = self.settled_names(time.monotonic())
+                if not ready:
+                    continue
+                # A fresh executor per batch, so name conflicts see the folders as they are now
+                executor = MoveExecutor(self.workers, conflict=self.conflict, metrics=self.metrics)
+                batch = execute_moves(self.plan(ready), self.journal, executor, metrics=self.metrics)
+                self.journal.flush()
+                moved += batch[0]
+                errors += batch[1]
+                skipped += batch[2]
+                if on_batch is not None:
+                    on_batch(*batch)
+            interrupted = False
+        finally:
+            backend.close()
+            result = SortResult(moved, errors, time.time() - start_time, stop.is_set(), skipped)
+            self.journal.end_session(result, interrupted)
+            if self.metrics is not None:
+                self.metrics.finish("watch", result, session_id)
+
+        return result
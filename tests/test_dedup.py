@@ -0,0 +1,63 @@
+import os
+
+from filesorter import RuleSet, SessionStore, WalkOptions, dedupe, execute_plan, plan_subdirectory_sort
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def read(path):
+    with open(path) as f:
+        return f.read()
+
+
+def sort_with_links(src, store, conflict):
+    moves = dedupe(plan_subdirectory_sort(str(src), walk=WalkOptions()), "link")
+    return execute_plan(moves, store, conflict=conflict)
+
+
+def test_link_is_not_made_to_an_unrelated_file_when_the_first_copy_was_skipped(tmp_path):
+    src = tmp_path / "src"
+    write(str(src / "Documents" / "a.txt"), "PRE-EXISTING UNRELATED")
+    write(str(src / "a.txt"), "same")
+    write(str(src / "sub" / "b.txt"), "same")
+    store = SessionStore(str(tmp_path / "log.db"), legacy_log=None)
+
+    result = sort_with_links(src, store, "skip")
+
+    assert (result.moved, result.skipped, result.errors) == (1, 1, 0)
+    assert read(str(src / "Documents" / "a.txt")) == "PRE-EXISTING UNRELATED"
+    assert read(str(src / "Documents" / "b.txt")) == "same"
+    assert os.stat(src / "Documents" / "b.txt").st_nlink == 1
+    assert read(str(src / "a.txt")) == "same"
+
+
+def test_link_points_at_the_moved_first_copy(tmp_path):
+    src = tmp_path / "src"
+    write(str(src / "a.txt"), "same")
+    write(str(src / "sub" / "b.txt"), "same")
+    store = SessionStore(str(tmp_path / "log.db"), legacy_log=None)
+
+    result = sort_with_links(src, store, "rename")
+
+    assert (result.moved, result.errors) == (2, 0)
+    first = os.stat(src / "Documents" / "a.txt")
+    assert os.stat(src / "Documents" / "b.txt").st_ino == first.st_ino
+    assert not os.path.exists(src / "sub" / "b.txt")
+
+
+def test_moved_duplicates_go_to_the_output_folder_under_nested_rules(tmp_path):
+    src = tmp_path / "src"
+    write(str(src / "a.jpg"), "same")
+    write(str(src / "sub" / "b.jpg"), "same")
+    store = SessionStore(str(tmp_path / "log.db"), legacy_log=None)
+    rules = RuleSet([{"extensions": [".jpg"], "destination": "Images/{year}/{month}"}])
+
+    plan = plan_subdirectory_sort(str(src), walk=WalkOptions(), rules=rules)
+    result = execute_plan(dedupe(plan, "move", output_folder=str(src)), store)
+
+    assert (result.moved, result.errors) == (2, 0)
+    assert read(str(src / "Duplicates" / "b.jpg")) == "same"
@@ -0,0 +1,130 @@
+import os
+import time
+
+from filesorter import (
+    Journal,
+    RuleSet,
+    SessionStore,
+    WalkOptions,
+    execute_plan,
+    plan_custom_sort,
+    plan_subdirectory_sort,
+    undo_operations,
+)
+
+
+def touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "w").close()
+
+
+def test_undo_keeps_an_empty_destination_tree_that_was_there_before(tmp_path):
+    touch(str(tmp_path / "in" / "a.jpg"))
+    touch(str(tmp_path / "in" / "b.txt"))
+    dest = tmp_path / "out" / "archive"
+    dest.mkdir(parents=True)
+    store = SessionStore(str(tmp_path / "log.db"), legacy_log=None)
+    rules = RuleSet([{"extensions": [".jpg"], "destination": "Images/{year}/{month}"}])
+
+    execute_plan(plan_custom_sort(str(tmp_path / "in"), str(dest), rules=rules), store)
+    result = undo_operations(store.get_last_session_operations(), store)
+
+    assert (result.restored, result.errors) == (2, 0)
+    assert sorted(os.listdir(tmp_path / "in")) == ["a.jpg", "b.txt"]
+    assert os.path.isdir(dest)
+    assert os.listdir(dest) == []
+
+
+def test_recursive_sort_leaves_its_templated_output_alone(tmp_path):
+    src = tmp_path / "src"
+    may_2020 = time.mktime((2020, 5, 1, 12, 0, 0, 0, 0, -1))
+    for path in (src / "a.jpg", src / "sub" / "b.jpg"):
+        touch(str(path))
+        os.utime(path, (may_2020, may_2020))
+    store = SessionStore(str(tmp_path / "log.db"), legacy_log=None)
+    rules = RuleSet([{"extensions": [".jpg"], "destination": "{year}/{month}"}])
+
+    first = execute_plan(plan_subdirectory_sort(str(src), WalkOptions(), rules=rules), store)
+    again = list(plan_subdirectory_sort(str(src), WalkOptions(), rules=rules))
+
+    assert first.moved == 2
+    assert again == []
+    assert sorted(os.listdir(src / "2020" / "05")) == ["a.jpg", "b.jpg"]
+
+
+def test_file_already_in_place_is_not_planned(tmp_path):
+    touch(str(tmp_path / "Images" / "a.jpg"))
+
+    moves = list(plan_custom_sort(str(tmp_path / "Images"), str(tmp_path)))
+
+    assert moves == []
+
+
+def sorted_tree(tmp_path, rules=None):
+    src = tmp_path / "src"
+    touch(str(src / "a.jpg"))
+    touch(str(src / "sub" / "b.txt"))
+    store = SessionStore(str(tmp_path / "log.db"), legacy_log=None)
+    execute_plan(plan_subdirectory_sort(str(src), WalkOptions(), rules=rules), store)
+    return src, store
+
+
+def test_undo_restores_files_and_removes_the_folders_it_created(tmp_path):
+    src, store = sorted_tree(tmp_path, RuleSet([{"extensions": [".jpg"], "destination": "Images/{year}/{month}"}]))
+
+    result = undo_operations(store.get_last_session_operations(), store)
+
+    assert (result.restored, result.errors, result.missing) == (2, 0, 0)
+    assert sorted(os.listdir(src)) == ["a.jpg", "sub"]
+    assert os.listdir(src / "sub") == ["b.txt"]
+    assert store.get_last_session_operations() == []
+
+
+def test_undo_counts_files_deleted_since_the_sort_as_missing(tmp_path):
+    src, store = sorted_tree(tmp_path)
+    os.remove(src / "Images" / "a.jpg")
+
+    result = undo_operations(store.get_last_session_operations(), store)
+
+    assert (result.restored, result.errors, result.missing) == (1, 0, 1)
+
+
+def test_failed_undo_keeps_the_operations_it_could_not_restore(tmp_path):
+    src, store = sorted_tree(tmp_path)
+    os.rmdir(src / "sub")
+    touch(str(src / "sub"))  # A file now stands where the source folder was
+
+    result = undo_operations(store.get_last_session_operations(), store)
+    remaining = store.get_last_session_operations()
+
+    assert (result.restored, result.errors) == (1, 1)
+    assert [op["destination"] for op in remaining] == [str(src / "Documents" / "b.txt")]
+    assert os.path.exists(src / "Documents" / "b.txt")
+
+
+def test_undo_of_a_hard_link_gives_the_duplicate_its_own_copy(tmp_path):
+    src = tmp_path / "src"
+    touch(str(src / "Documents" / "a.txt"))
+    os.link(src / "Documents" / "a.txt", src / "b.txt")
+    store = SessionStore(str(tmp_path / "log.db"), legacy_log=None)
+    store.start_session()
+    store.log_operation(str(tmp_path / "b.txt"), str(src / "b.txt"), "link")
+    store.end_session()
+
+    result = undo_operations(store.get_last_session_operations(), store)
+
+    assert result.restored == 1
+    assert os.stat(tmp_path / "b.txt").st_nlink == 1
+    assert not os.path.exists(src / "b.txt")
+
+
+def test_undo_with_the_text_journal(tmp_path):
+    src = tmp_path / "src"
+    touch(str(src / "a.txt"))
+    journal = Journal(str(tmp_path / "log.txt"))
+
+    execute_plan(plan_subdirectory_sort(str(src)), journal)
+    result = undo_operations(journal.get_last_session_operations(), journal)
+
+    assert result.restored == 1
+    assert os.listdir(src) == ["a.txt"]
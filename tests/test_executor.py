@@ -0,0 +1,24 @@
+import os
+import threading
+
+from filesorter import Move, SessionStore, execute_plan
+
+
+def touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "w").close()
+
+
+def test_cancelled_sort_creates_no_folders_for_moves_it_never_ran(tmp_path):
+    src = tmp_path / "src"
+    touch(str(src / "a.txt"))
+    touch(str(src / "b.bin"))
+    store = SessionStore(str(tmp_path / "log.db"), legacy_log=None)
+    plan = [Move(str(src / "a.txt"), str(src / "Documents" / "a.txt"), "Documents"),
+            Move(str(src / "b.bin"), str(src / "Others" / "b.bin"), "Others")]
+    cancel = threading.Event()
+
+    result = execute_plan(plan, store, progress=lambda done, errors: cancel.set(), cancel=cancel)
+
+    assert (result.moved, result.cancelled) == (1, True)
+    assert sorted(os.listdir(src)) == ["Documents", "b.bin"]
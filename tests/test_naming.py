@@ -0,0 +1,81 @@
+import os
+
+import pytest
+
+from filesorter.naming import ConflictSkipped, NameIndex
+
+
+def touch(path, mtime=None):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "w").close()
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def test_free_name_is_kept(tmp_path):
+    names = NameIndex("rename")
+
+    assert names.resolve("a.txt", str(tmp_path / "a.txt")) == str(tmp_path / "a.txt")
+
+
+def test_rename_counts_up_within_one_run(tmp_path):
+    touch(str(tmp_path / "a.txt"))
+    names = NameIndex("rename")
+
+    first = names.resolve("x/a.txt", str(tmp_path / "a.txt"))
+    second = names.resolve("y/a.txt", str(tmp_path / "a.txt"))
+
+    assert first == str(tmp_path / "a (1).txt")
+    assert second == str(tmp_path / "a (2).txt")
+
+
+def test_rename_skips_suffixes_already_on_disk(tmp_path):
+    touch(str(tmp_path / "a.txt"))
+    touch(str(tmp_path / "a (1).txt"))
+
+    assert NameIndex("rename").resolve("x/a.txt", str(tmp_path / "a.txt")) == str(tmp_path / "a (2).txt")
+
+
+def test_skip_raises_for_a_taken_name(tmp_path):
+    touch(str(tmp_path / "a.txt"))
+
+    with pytest.raises(ConflictSkipped):
+        NameIndex("skip").resolve("x/a.txt", str(tmp_path / "a.txt"))
+
+
+def test_overwrite_replaces_a_file_that_was_there_before(tmp_path):
+    touch(str(tmp_path / "a.txt"))
+    names = NameIndex("overwrite")
+
+    assert names.resolve("x/a.txt", str(tmp_path / "a.txt")) == str(tmp_path / "a.txt")
+    assert names.replaced == {str(tmp_path / "a.txt")}
+
+
+def test_overwrite_never_replaces_a_file_moved_in_the_same_run(tmp_path):
+    names = NameIndex("overwrite")
+
+    first = names.resolve("x/a.txt", str(tmp_path / "a.txt"))
+    second = names.resolve("y/a.txt", str(tmp_path / "a.txt"))
+
+    assert first == str(tmp_path / "a.txt")
+    assert second == str(tmp_path / "a (1).txt")
+    assert names.replaced == set()
+
+
+def test_newer_only_replaces_an_older_file(tmp_path):
+    touch(str(tmp_path / "dest" / "old.txt"), mtime=1000)
+    touch(str(tmp_path / "dest" / "new.txt"), mtime=3000)
+    touch(str(tmp_path / "src" / "old.txt"), mtime=2000)
+    touch(str(tmp_path / "src" / "new.txt"), mtime=2000)
+    names = NameIndex("newer")
+
+    replaced = names.resolve(str(tmp_path / "src" / "old.txt"), str(tmp_path / "dest" / "old.txt"))
+    with pytest.raises(ConflictSkipped):
+        names.resolve(str(tmp_path / "src" / "new.txt"), str(tmp_path / "dest" / "new.txt"))
+
+    assert replaced == str(tmp_path / "dest" / "old.txt")
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        NameIndex("clobber")
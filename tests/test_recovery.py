@@ -0,0 +1,113 @@
+import os
+
+import pytest
+
+from filesorter import Move, SessionStore, execute_plan, recover_session, resume_session, rollback_session
+
+
+def touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "w").close()
+
+
+def crash(done, errors):
+    raise RuntimeError("crash")
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def read(path):
+    with open(path) as f:
+        return f.read()
+
+
+def crashed_session(db, moves, replaced=()):
+    """Intents of a session whose process died before running them"""
+    store = SessionStore(db, legacy_log=None)
+    store.start_session()
+    store.write_intents(moves, set(replaced))
+    return SessionStore(db, legacy_log=None)
+
+
+def test_rollback_of_a_session_that_moved_nothing_leaves_no_folders(tmp_path):
+    src = tmp_path / "src"
+    touch(str(src / "a.txt"))
+    touch(str(src / "b.bin"))
+    store = SessionStore(str(tmp_path / "log.db"), legacy_log=None)
+    plan = [Move(str(src / "gone.txt"), str(src / "Documents" / "gone.txt"), "Documents"),
+            Move(str(src / "a.txt"), str(src / "Documents" / "a.txt"), "Documents"),
+            Move(str(src / "b.bin"), str(src / "Others" / "b.bin"), "Others")]
+
+    with pytest.raises(RuntimeError):
+        execute_plan(plan, store, progress=crash)
+    [session] = store.interrupted_sessions()
+    rollback_session(store, session["id"])
+
+    assert sorted(os.listdir(src)) == ["a.txt", "b.bin"]
+
+
+def test_resume_finishes_an_interrupted_sort(tmp_path):
+    src = tmp_path / "src"
+    for name in ("a.txt", "b.txt", "c.txt"):
+        touch(str(src / name))
+    store = SessionStore(str(tmp_path / "log.db"), legacy_log=None)
+    calls = []
+
+    def crash_after_first(done, errors):
+        calls.append(done)
+        if len(calls) == 1:
+            raise RuntimeError("crash")
+
+    plan = [Move(str(src / name), str(src / "Documents" / name), "Documents") for name in ("a.txt", "b.txt", "c.txt")]
+    with pytest.raises(RuntimeError):
+        execute_plan(plan, store, progress=crash_after_first)
+    [session] = store.interrupted_sessions()
+    result = resume_session(store, session["id"])
+
+    assert (result.moved, result.errors) == (2, 0)
+    assert store.interrupted_sessions() == []
+    assert len(store.get_session_operations(session["id"])) == 3
+    assert sorted(os.listdir(src / "Documents")) == ["a.txt", "b.txt", "c.txt"]
+
+
+def test_recovery_drops_a_partial_copy(tmp_path):
+    write(str(tmp_path / "src" / "a.txt"), "complete contents")
+    write(str(tmp_path / "dst" / "a.txt"), "comp")
+    move = Move(str(tmp_path / "src" / "a.txt"), str(tmp_path / "dst" / "a.txt"), "Documents")
+    store = crashed_session(str(tmp_path / "log.db"), [move])
+
+    [session] = store.interrupted_sessions()
+    remaining = recover_session(store, session["id"])
+
+    assert remaining == [move]
+    assert not os.path.exists(move.destination)
+    assert read(move.source) == "complete contents"
+
+
+def test_recovery_keeps_the_file_an_overwrite_was_going_to_replace(tmp_path):
+    write(str(tmp_path / "src" / "a.txt"), "new")
+    write(str(tmp_path / "dst" / "a.txt"), "old")
+    move = Move(str(tmp_path / "src" / "a.txt"), str(tmp_path / "dst" / "a.txt"), "Documents")
+    store = crashed_session(str(tmp_path / "log.db"), [move], replaced=[move.destination])
+
+    [session] = store.interrupted_sessions()
+    rollback_session(store, session["id"])
+
+    assert read(move.destination) == "old"
+    assert read(move.source) == "new"
+
+
+def test_moves_that_finished_before_the_crash_are_journaled(tmp_path):
+    write(str(tmp_path / "dst" / "a.txt"), "moved")
+    move = Move(str(tmp_path / "src" / "a.txt"), str(tmp_path / "dst" / "a.txt"), "Documents")
+    store = crashed_session(str(tmp_path / "log.db"), [move])
+
+    [session] = store.interrupted_sessions()
+    result = rollback_session(store, session["id"])
+
+    assert result.restored == 1
+    assert read(move.source) == "moved"
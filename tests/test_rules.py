@@ -0,0 +1,132 @@
+import json
+import os
+import re
+import time
+
+import pytest
+
+from filesorter import RuleError, RuleSet
+from filesorter.rules import parse_size
+
+
+def test_templated_first_folder_is_an_output_pattern():
+    rules = RuleSet([{"extensions": [".jpg"], "destination": "{year}/{month}"},
+                     {"extensions": [".tar.gz"], "destination": "{ext}-files"}], fallback=False)
+
+    patterns = [re.compile(pattern) for pattern in rules.output_patterns()]
+
+    assert patterns[0].fullmatch("2026") and not patterns[0].fullmatch("photos")
+    assert patterns[1].fullmatch("gz-files") and not patterns[1].fullmatch("jpg-files")
+    assert rules.output_roots() == set()
+
+
+def test_bad_regex_is_a_rule_error():
+    with pytest.raises(RuleError):
+        RuleSet([{"regex": "(", "destination": "x"}])
+
+
+class FakeRecord:
+    def __init__(self, name, size=100, mtime=0.0):
+        self.name = name
+        self.ext = "." + name.rsplit(".", 1)[-1] if "." in name else ""
+        self.size = size
+        self.mtime = mtime
+
+
+def test_first_matching_rule_wins_across_multi_part_extensions():
+    rules = RuleSet([{"extensions": [".gz"], "destination": "Gzip"},
+                     {"extensions": [".tar.gz"], "destination": "Tarballs"}], sniff=False)
+
+    assert rules.match(FakeRecord("x.tar.gz"), now=0)[1] == "Gzip"
+    assert rules.match(FakeRecord("x.gz"), now=0)[1] == "Gzip"
+
+
+def test_size_is_checked_before_the_category(monkeypatch):
+    import filesorter.rules
+
+    classified = []
+    monkeypatch.setattr(filesorter.rules, "classify_record",
+                        lambda record, sniff: classified.append(record.name) or "Others")
+    rules = RuleSet([{"categories": ["Others"], "min_size": "1 KB", "destination": "Big"}], fallback=False)
+
+    assert rules.match(FakeRecord("small.bin", size=10), now=0) is None
+    assert classified == []
+
+
+class VanishedRecord(FakeRecord):
+    @property
+    def size(self):
+        raise FileNotFoundError(self.name)
+
+    @size.setter
+    def size(self, value):
+        pass
+
+
+def test_rules_may_reuse_regex_group_names():
+    rules = RuleSet([{"regex": r"(?P<year>\d{4})-a", "destination": "A"},
+                     {"regex": r"(?P<year>\d{4})-b", "destination": "B"}], sniff=False, fallback=False)
+
+    assert rules.match(FakeRecord("2024-b"), now=0)[1] == "B"
+
+
+def test_glob_pattern_ignores_case():
+    rules = RuleSet([{"pattern": "invoice_*", "destination": "Invoices"}], fallback=False)
+
+    assert rules.match(FakeRecord("INVOICE_7.pdf"), now=0)[1] == "Invoices"
+    assert rules.match(FakeRecord("receipt.pdf"), now=0) is None
+
+
+def test_size_and_age_limits():
+    rules = RuleSet([{"min_size": "1 MB", "destination": "Big"},
+                     {"older_than_days": 30, "destination": "Old"}], sniff=False, fallback=False)
+    day = 86400
+
+    assert rules.match(FakeRecord("a.bin", size=2 << 20, mtime=0), now=day)[1] == "Big"
+    assert rules.match(FakeRecord("a.bin", size=10, mtime=0), now=31 * day)[1] == "Old"
+    assert rules.match(FakeRecord("a.bin", size=10, mtime=0), now=day) is None
+
+
+def test_file_that_vanished_matches_nothing():
+    rules = RuleSet([{"min_size": 1, "destination": "Big"}])
+
+    assert rules.match(VanishedRecord("a.bin"), now=0) is None
+
+
+def test_destination_template_is_rendered():
+    rules = RuleSet([{"name": "Photos", "extensions": [".jpg"], "destination": "{name}/{ext}/{year}-{month}"}],
+                    sniff=False)
+    may_2020 = time.mktime((2020, 5, 1, 12, 0, 0, 0, 0, -1))
+
+    assert rules.match(FakeRecord("a.jpg", mtime=may_2020), now=0) == (
+        "Photos", os.path.join("Photos", "jpg", "2020-05"))
+
+
+def test_fallback_sorts_by_category():
+    rules = RuleSet([], sniff=False)
+
+    assert rules.match(FakeRecord("a.pdf"), now=0) == ("Documents", "Documents")
+
+
+def test_unknown_keys_and_fields_are_rule_errors():
+    with pytest.raises(RuleError):
+        RuleSet([{"extension": ".jpg", "destination": "x"}])
+    with pytest.raises(RuleError):
+        RuleSet([{"destination": "{season}"}])
+
+
+def test_rules_load_from_json(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({"fallback": False, "rule": [{"extensions": [".log"], "destination": "Logs"}]}))
+
+    rules = RuleSet.load(str(path), sniff=False)
+
+    assert rules.match(FakeRecord("a.log"), now=0)[1] == "Logs"
+    assert rules.match(FakeRecord("a.txt"), now=0) is None
+
+
+def test_parse_size():
+    assert parse_size("1.5 kb") == 1536
+    assert parse_size(10) == 10
+    with pytest.raises(RuleError):
+        parse_size("ten")